@@ -0,0 +1,196 @@
+import argparse
+from datetime import datetime
+
+import numpy
+
+import utils
+
+trade_dtype = numpy.dtype([('symbol', 'U20'), ('entry_time', 'i8'), ('exit_time', 'i8'), ('entry_price', 'f8'),
+                           ('take_profit_price', 'f8'), ('exit_price', 'f8'), ('profit', 'f8'), ('reason', 'U10')])
+
+
+class Strategy(object):
+    market_type = 'BULL'
+    trigger_percent = 0.09
+    stop_loss_percent = 0.7
+    take_profit_low_percent = 0.3
+    already_increased_percent = 0.4
+    increase_lookback = '1d'
+    fluctuation_restrict = 1.3
+    kline_interval = '3m'
+    trailing_ticks = 10
+    commission = 0.001
+
+    def __init__(self, **params):
+        if params.get('market_type') == 'BEAR':
+            self.trigger_percent = 0.2
+            self.fluctuation_restrict = 10000000000
+            self.kline_interval = '6h'
+        for name, value in params.items():
+            if not hasattr(self, name):
+                raise TypeError('Unknown strategy parameter: {}'.format(name))
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return 'Strategy({})'.format(', '.join('{}={!r}'.format(name, getattr(self, name)) for name in (
+            'market_type', 'trigger_percent', 'stop_loss_percent', 'take_profit_low_percent',
+            'already_increased_percent', 'fluctuation_restrict', 'kline_interval', 'trailing_ticks')))
+
+
+def interval_opens(klines, interval):
+    buckets = klines['open_time'] // utils.interval_to_milliseconds(interval)
+    indexes = numpy.arange(len(klines))
+    starts = numpy.ones(len(klines), dtype=bool)
+    starts[1:] = buckets[1:] != buckets[:-1]
+    return klines['open'][numpy.maximum.accumulate(numpy.where(starts, indexes, 0))], buckets
+
+
+def entry_candidates(klines, strategy):
+    opens, buckets = interval_opens(klines, strategy.kline_interval)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        fluctuation = numpy.abs(klines['close'] / opens - 1)
+    mask = (fluctuation >= strategy.trigger_percent) & \
+           (fluctuation < strategy.trigger_percent * strategy.fluctuation_restrict)
+    candidates = numpy.flatnonzero(mask)
+
+    if strategy.already_increased_percent is not None and len(candidates) and len(klines) > 1:
+        lookback = max(utils.interval_to_milliseconds(strategy.increase_lookback) //
+                       int(klines['open_time'][1] - klines['open_time'][0]), 1)
+        low = klines['low']
+        lowest = numpy.array([low[max(index - lookback, 0):index + 1].min() for index in candidates])
+        candidates = candidates[klines['close'][candidates] / lowest - 1 < strategy.already_increased_percent]
+    return candidates, buckets
+
+
+def simulate_bull(close, entry, strategy):
+    price = close[entry]
+    stop_loss_price = price * strategy.stop_loss_percent
+    window = strategy.trailing_ticks * 16
+
+    while True:
+        segment = close[entry + 1:entry + 1 + window]
+        if not len(segment):
+            return None
+
+        highs = numpy.maximum.accumulate(numpy.concatenate(([0], segment)))
+        ticks = numpy.arange(1, len(segment) + 1)
+        last_high = numpy.maximum.accumulate(numpy.where(segment > highs[:-1], ticks, 0))
+        counts = ticks - last_high
+        exits = numpy.flatnonzero((counts >= strategy.trailing_ticks) | (segment <= stop_loss_price))
+
+        if len(exits):
+            offset = exits[0]
+            reason = 'trailing' if counts[offset] >= strategy.trailing_ticks else 'stop_loss'
+            break
+        if entry + 1 + window >= len(close):
+            offset = len(segment) - 1
+            reason = 'end'
+            break
+        window *= 4
+
+    take_profits = numpy.flatnonzero(segment[:offset + 1] / price - 1 >= strategy.take_profit_low_percent)
+    take_profit_price = segment[take_profits[0]] if len(take_profits) else numpy.nan
+    return entry + 1 + offset, take_profit_price, reason
+
+
+def simulate_bear(close, buckets, entry):
+    exit_index = numpy.searchsorted(buckets, buckets[entry], side='right')
+    if exit_index >= len(close):
+        return None
+    return exit_index, numpy.nan, 'next_kline'
+
+
+def run_symbol(symbol, klines, strategy):
+    candidates, buckets = entry_candidates(klines, strategy)
+    close = klines['close']
+    trades = []
+
+    index = 0
+    while index < len(candidates):
+        entry = candidates[index]
+        if strategy.market_type == 'BULL':
+            result = simulate_bull(close, entry, strategy)
+        else:
+            result = simulate_bear(close, buckets, entry)
+        if not result:
+            break
+
+        exit_index, take_profit_price, reason = result
+        entry_price = close[entry]
+        exit_price = close[exit_index]
+        if numpy.isnan(take_profit_price):
+            profit = exit_price / entry_price - 1 - strategy.commission * 2
+        else:
+            profit = (take_profit_price + exit_price) * 0.5 / entry_price - 1 - strategy.commission * 2
+        trades.append((symbol, klines['open_time'][entry], klines['open_time'][exit_index], entry_price,
+                       take_profit_price, exit_price, profit, reason))
+        index = numpy.searchsorted(candidates, exit_index + 1)
+
+    return numpy.array(trades, dtype=trade_dtype)
+
+
+def run(klines_by_symbol, strategy):
+    trades = [run_symbol(symbol, klines, strategy) for symbol, klines in klines_by_symbol.items() if len(klines)]
+    if not trades:
+        return numpy.empty(0, dtype=trade_dtype)
+    trades = numpy.concatenate(trades)
+    return trades[numpy.argsort(trades['entry_time'], kind='stable')]
+
+
+def summarize(trades):
+    profits = trades['profit']
+    if not len(profits):
+        return {'trades': 0, 'win_rate': 0, 'total_profit': 0, 'average_profit': 0, 'max_drawdown': 0,
+                'best': 0, 'worst': 0}
+    cumulative = numpy.cumsum(profits)
+    drawdown = numpy.maximum.accumulate(numpy.concatenate(([0], cumulative)))[1:] - cumulative
+    return {'trades': len(profits), 'win_rate': float((profits > 0).mean()),
+            'total_profit': float(cumulative[-1]), 'average_profit': float(profits.mean()),
+            'max_drawdown': float(drawdown.max()), 'best': float(profits.max()), 'worst': float(profits.min())}
+
+
+def load_klines(store, symbols, interval, start_time, end_time=None, refresh=True):
+    return {symbol: store.query(symbol, interval, start_time, end_time, refresh) for symbol in symbols}
+
+
+def parse_date(value):
+    return int(datetime.strptime(value, '%Y-%m-%d').timestamp() * 1000)
+
+
+def main():
+    import client
+    import kline_store
+
+    parser = argparse.ArgumentParser(description='Backtest the bull/bear strategies over stored klines.')
+    parser.add_argument('symbols', nargs='*', help='symbols to backtest, defaults to every pair of --base')
+    parser.add_argument('--base', default='ETH')
+    parser.add_argument('--market-type', default='BULL', choices=('BULL', 'BEAR'))
+    parser.add_argument('--tick-interval', default='1m')
+    parser.add_argument('--start', default='2018-01-01')
+    parser.add_argument('--end')
+    parser.add_argument('--offline', action='store_true', help='only use klines already in the store')
+    parser.add_argument('--trades', action='store_true', help='print every trade')
+    args = parser.parse_args()
+
+    base_url = 'https://api.binance.com'
+    session = client.RateLimitedSession()
+    store = kline_store.KlineStore(session, base_url)
+    symbols = args.symbols or [ticker['symbol'] for ticker in session.get(
+        '{}/api/v3/ticker/price'.format(base_url)).json() if ticker['symbol'].endswith(args.base)]
+
+    klines = load_klines(store, symbols, args.tick_interval, parse_date(args.start),
+                         parse_date(args.end) if args.end else None, not args.offline)
+    trades = run(klines, Strategy(market_type=args.market_type))
+
+    if args.trades:
+        for trade in trades:
+            print('{} {} -> {} {:.8f} -> {:.8f} {:+.4f} {}'.format(
+                trade['symbol'], datetime.fromtimestamp(trade['entry_time'] / 1000),
+                datetime.fromtimestamp(trade['exit_time'] / 1000), trade['entry_price'], trade['exit_price'],
+                trade['profit'], trade['reason']))
+    for name, value in summarize(trades).items():
+        print('{}: {}'.format(name, value))
+
+
+if __name__ == '__main__':
+    main()
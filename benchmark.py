@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from time import perf_counter, time
+from types import SimpleNamespace
+
+import numpy
+
+import client
+import kline_store
+import positions
+import scheduler
+import simulator
+import utils
+
+baseline_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+benchmarks = {}
+
+
+def benchmark(number, repeat=5):
+    def register(setup):
+        benchmarks[setup.__name__] = (setup, number, repeat)
+        return setup
+    return register
+
+
+class BenchmarkSession(client.RateLimitedSession):
+    exchange = None
+
+    def __init__(self, *args, **kwargs):
+        super(BenchmarkSession, self).__init__(*args, **kwargs)
+        self.mount('http://', simulator.ExchangeAdapter(self.exchange))
+        self.mount('https://', simulator.ExchangeAdapter(self.exchange))
+
+
+@contextmanager
+def patched(target, name, value):
+    original = getattr(target, name)
+    setattr(target, name, value)
+    try:
+        yield
+    finally:
+        setattr(target, name, original)
+
+
+class SweepScheduler(scheduler.ScanScheduler):
+
+    def __init__(self, symbols, steps):
+        super(SweepScheduler, self).__init__()
+        for symbol in symbols:
+            self.add(symbol)
+        self.steps = steps
+
+    def pop(self):
+        if not self.steps:
+            return None
+        self.steps -= 1
+        return super(SweepScheduler, self).pop()
+
+
+def make_exchange(symbol_count, minutes=600, pump_rate=0, seed=1):
+    start_time = int(time() * 1000) // 60000 * 60000 - minutes * 60000
+    klines = simulator.synthetic_klines(symbol_count, minutes, start_time, volatility=0.0005, pump_rate=pump_rate,
+                                        seed=seed)
+    return simulator.SimulatedExchange(klines, simulator.ReplayClock(start_time + (minutes - 1) * 60000, 0))
+
+
+def make_binance(exchange):
+    import main
+
+    with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as config_file:
+        json.dump({'api_key': 'benchmark', 'secret_key': 'benchmark', 'base_url': 'http://simulator',
+                   'weight_limit': 10 ** 12, 'order_limit': 10 ** 12}, config_file)
+    try:
+        session_class = type('Session', (BenchmarkSession,), {'exchange': exchange})
+        with patched(main, 'client', SimpleNamespace(RateLimitedSession=session_class)):
+            binance = main.Binance(config_file.name, 'BULL')
+    finally:
+        os.remove(config_file.name)
+    return binance
+
+
+@benchmark(number=5)
+def monitor_sweep():
+    exchange = make_exchange(500)
+    binance = make_binance(exchange)
+    symbols = [entry[1] for entry in binance.scheduler.entries.values()]
+
+    def sweep():
+        binance.scheduler = SweepScheduler(symbols, len(symbols))
+        binance.monitor()
+    return sweep
+
+
+@benchmark(number=2000)
+def sign_order():
+    binance = make_binance(make_exchange(1))
+
+    rules = binance.registry.rules('SIM0ETH')
+    quantity = rules.quantity(12.345)
+    return lambda: binance.sign_query(rules.market_order('BUY', quantity))
+
+
+@benchmark(number=20000)
+def order_precheck():
+    binance = make_binance(make_exchange(100))
+    return lambda: utils.order_precheck('SIM42ETH', 1234.56789, binance.registry)
+
+
+@benchmark(number=20000)
+def handle_order_data():
+    order_info = {'symbol': 'SIM0ETH', 'status': 'FILLED', 'executedQty': '500.00000000', 'fills': [
+        {'price': '0.0012{}000'.format(index), 'qty': '100.00000000', 'commission': '0.10000000',
+         'commissionAsset': 'SIM0'} for index in range(5)]}
+    return lambda: utils.handle_order_data(order_info)
+
+
+@benchmark(number=200)
+def qualify():
+    exchange = make_exchange(1, minutes=1500)
+    klines = exchange.get_klines('SIM0ETH', '1m', limit=500)
+    return lambda: utils.qualify(klines, 0.4)
+
+
+@benchmark(number=20000)
+def operate_bull_tick():
+    exchange = make_exchange(1)
+    binance = make_binance(exchange)
+    kline = exchange.get_klines('SIM0ETH', binance.kline_interval, limit=1)[-1]
+    price = float(kline[4])
+    asset = positions.Position('SIM0ETH', 'ETH', price, int(kline[0]), 100, spent=1,
+                               stop_loss_price=price * binance.stop_loss_percent)
+
+    def tick():
+        asset.count = 0
+        binance.operate_bull(asset, kline)
+    return tick
+
+
+@benchmark(number=1, repeat=3)
+def analyze_bull():
+    import statistics
+
+    hours = 24 * 365 * 2
+    start_time = int(time() * 1000) // 3600000 * 3600000 - hours * 3600000
+    hourly = simulator.synthetic_klines(20, hours, start_time, volatility=0.01, pump_rate=0.002, seed=2)
+    for klines in hourly.values():
+        klines['open_time'] = start_time + numpy.arange(hours) * 3600000
+        klines['close_time'] = klines['open_time'] + 3599999
+    exchange = simulator.SimulatedExchange(hourly, simulator.ReplayClock(start_time + hours * 3600000, 0))
+    session = type('Session', (BenchmarkSession,), {'exchange': exchange})(10 ** 12)
+    store = kline_store.KlineStore(session, 'http://simulator', 'klines')
+    for symbol, klines in hourly.items():
+        klines.tofile(store.path(symbol, '1h'))
+        klines[::24].tofile(store.path(symbol, '1d'))
+        store.save_meta(symbol, '1h', {'start': int(statistics.history_starting_timestamp)})
+        store.save_meta(symbol, '1d', {'start': int(statistics.history_starting_timestamp)})
+
+    def analyze():
+        statistics.daily_klines.clear()
+        with patched(statistics, 'session', session), patched(statistics, 'store', store):
+            statistics.analyze_bull('ETH')
+    return analyze
+
+
+def measure(function, number, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((perf_counter() - started) / number)
+    timings.sort()
+    return {'median': timings[len(timings) // 2], 'min': timings[0]}
+
+
+def machine_key():
+    return '{}-{}-{}cpu-py{}'.format(platform.system(), platform.machine(), os.cpu_count(), platform.python_version())
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(baseline_path)).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_baselines():
+    if not os.path.exists(baseline_path):
+        return {}
+    with open(baseline_path) as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baselines(baselines):
+    with open(baseline_path, 'w') as baseline_file:
+        json.dump(baselines, baseline_file, indent=4, sort_keys=True)
+        baseline_file.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the trading hot paths against stored baselines.')
+    parser.add_argument('names', nargs='*', help='benchmarks to run, defaults to all of them')
+    parser.add_argument('--save', action='store_true', help='store the results as the baseline for this machine')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before flagging')
+    args = parser.parse_args()
+
+    names = args.names or list(benchmarks)
+    baseline = load_baselines().get(machine_key(), {}).get('results', {})
+    results = {}
+    regressions = []
+
+    working_directory = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            for name in names:
+                setup, number, repeat = benchmarks[name]
+                results[name] = measure(setup(), number, repeat)
+
+                previous = baseline.get(name)
+                change = ''
+                if previous:
+                    ratio = results[name]['median'] / previous['median'] - 1
+                    change = '{:+.1%}'.format(ratio)
+                    if ratio > args.tolerance:
+                        regressions.append(name)
+                        change += ' REGRESSION'
+                print('{:<20} {:>12.2f}us {:>12}'.format(name, results[name]['median'] * 1000000, change))
+        finally:
+            os.chdir(working_directory)
+
+    if args.save:
+        baselines = load_baselines()
+        baselines[machine_key()] = {'commit': current_commit(), 'results': dict(baseline, **results)}
+        save_baselines(baselines)
+    if regressions:
+        print('Regressions: {}'.format(', '.join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
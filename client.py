@@ -0,0 +1,148 @@
+import threading
+from time import perf_counter, time
+from urllib.parse import urlsplit
+
+import requests
+
+
+class RateLimitedSession(requests.Session):
+    weight_limit = 1200
+    weight_interval = 60
+    order_limit = 50
+    order_interval = 10
+    order_reserve = 0.1
+    max_retries = 5
+    backoff_base = 1
+    max_backoff = 300
+    share = 1
+    endpoint_weights = {
+        '/api/v1/exchangeInfo': 20,
+        '/api/v3/exchangeInfo': 20,
+        '/api/v1/klines': 2,
+        '/api/v3/klines': 2,
+        '/api/v3/account': 20,
+        '/api/v3/ticker/price': 4,
+        '/api/v3/order': 1,
+        '/api/v3/order/oco': 1,
+        '/api/v3/orderList': 2,
+        '/api/v3/userDataStream': 2,
+    }
+    order_paths = ('/api/v3/order', '/api/v3/order/oco')
+
+    def __init__(self, weight_limit=None, order_limit=None, log=None, pool_size=None, metrics=None, share=None):
+        super(RateLimitedSession, self).__init__()
+        if pool_size:
+            self.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=pool_size))
+            self.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=pool_size))
+        if weight_limit:
+            self.weight_limit = weight_limit
+        if order_limit:
+            self.order_limit = order_limit
+        if share:
+            self.share = share
+            self.weight_limit = self.weight_limit * share
+            self.order_limit = self.order_limit * share
+        self.log = log or (lambda symbol, msg: None)
+        self.metrics = metrics
+        self.weight_tokens = self.weight_limit
+        self.order_tokens = self.order_limit
+        self.refilled_at = time()
+        self.banned_until = 0
+        self.backoffs = 0
+        self.waiting_orders = 0
+        self.used_weight = {}
+        self.condition = threading.Condition()
+
+    def refill(self, now):
+        elapsed = now - self.refilled_at
+        self.refilled_at = now
+        self.weight_tokens = min(self.weight_limit,
+                                 self.weight_tokens + elapsed * self.weight_limit / self.weight_interval)
+        self.order_tokens = min(self.order_limit,
+                                self.order_tokens + elapsed * self.order_limit / self.order_interval)
+
+    def acquire(self, path, weight, is_order):
+        weight = min(weight, self.weight_limit)
+        reserve = 0 if is_order else self.weight_limit * self.order_reserve
+        with self.condition:
+            if is_order:
+                self.waiting_orders += 1
+            try:
+                while True:
+                    now = time()
+                    self.refill(now)
+                    wait = self.banned_until - now
+
+                    if wait <= 0:
+                        if not is_order and self.waiting_orders:
+                            wait = self.weight_interval / self.weight_limit
+                        elif self.weight_tokens - weight < reserve:
+                            wait = (weight + reserve - self.weight_tokens) * self.weight_interval / self.weight_limit
+                        elif is_order and self.order_tokens < 1:
+                            wait = (1 - self.order_tokens) * self.order_interval / self.order_limit
+                        else:
+                            self.weight_tokens -= weight
+                            if is_order:
+                                self.order_tokens -= 1
+                            self.used_weight[path] = self.used_weight.get(path, 0) + weight
+                            return
+                    self.condition.wait(wait)
+            finally:
+                if is_order:
+                    self.waiting_orders -= 1
+                    self.condition.notify_all()
+
+    def sync(self, response):
+        used_weight = response.headers.get('X-MBX-USED-WEIGHT-1M') or response.headers.get('X-MBX-USED-WEIGHT')
+        order_count = response.headers.get('X-MBX-ORDER-COUNT-10S')
+        with self.condition:
+            if used_weight:
+                self.weight_tokens = min(self.weight_tokens, self.weight_limit - int(used_weight) * self.share)
+            if order_count:
+                self.order_tokens = min(self.order_tokens, self.order_limit - int(order_count) * self.share)
+
+    def back_off(self, response):
+        retry_after = response.headers.get('Retry-After')
+        with self.condition:
+            self.backoffs += 1
+            delay = min(self.backoff_base * 2 ** (self.backoffs - 1), self.max_backoff)
+            if retry_after:
+                delay = max(delay, int(retry_after))
+            self.banned_until = max(self.banned_until, time() + delay)
+        self.log('ERROR', 'Rate limited with status {}, backing off for {}s'.format(response.status_code, delay))
+
+    def request(self, method, url, *args, **kwargs):
+        path = urlsplit(url).path
+        weight = self.endpoint_weights.get(path, 1)
+        is_order = path in self.order_paths and method.upper() != 'GET'
+        retries = 0 if 'signature=' in url else self.max_retries
+
+        for attempt in range(retries + 1):
+            if self.metrics:
+                with self.metrics.time('rate_limit_wait_seconds', path=path):
+                    self.acquire(path, weight, is_order)
+                response = self.timed_request(method, url, path, *args, **kwargs)
+            else:
+                self.acquire(path, weight, is_order)
+                response = super(RateLimitedSession, self).request(method, url, *args, **kwargs)
+            self.sync(response)
+
+            if response.status_code not in (418, 429):
+                with self.condition:
+                    self.backoffs = 0
+                return response
+            self.back_off(response)
+        return response
+
+    def timed_request(self, method, url, path, *args, **kwargs):
+        started = perf_counter()
+        try:
+            response = super(RateLimitedSession, self).request(method, url, *args, **kwargs)
+        except Exception as e:
+            self.metrics.increment('http_errors_total', path=path, error=type(e).__name__)
+            raise
+        self.metrics.observe('http_request_seconds', perf_counter() - started, path=path)
+        self.metrics.increment('http_requests_total', path=path, status=response.status_code)
+        if response.status_code >= 400:
+            self.metrics.increment('http_errors_total', path=path, error=response.status_code)
+        return response
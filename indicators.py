@@ -0,0 +1,97 @@
+from collections import deque
+
+
+class RollingWindow(object):
+
+    def __init__(self, span):
+        self.span = span
+        self.highs = deque()
+        self.lows = deque()
+        self.last_timestamp = None
+
+    def push(self, timestamp, low, high):
+        highs = self.highs
+        while highs and highs[-1][1] <= high:
+            highs.pop()
+        highs.append((timestamp, high))
+
+        lows = self.lows
+        while lows and lows[-1][1] >= low:
+            lows.pop()
+        lows.append((timestamp, low))
+
+        self.last_timestamp = timestamp
+        self.evict(timestamp)
+
+    def evict(self, now):
+        cutoff = now - self.span
+        while self.highs and self.highs[0][0] < cutoff:
+            self.highs.popleft()
+        while self.lows and self.lows[0][0] < cutoff:
+            self.lows.popleft()
+
+    def high(self):
+        return self.highs[0][1] if self.highs else None
+
+    def low(self):
+        return self.lows[0][1] if self.lows else None
+
+    def range_percent(self):
+        if not self.highs:
+            return None
+        return self.highs[0][1] / self.lows[0][1] - 1
+
+    def change_percent(self, price):
+        if not self.lows:
+            return None
+        return price / self.lows[0][1] - 1
+
+
+class KlineIndicators(object):
+
+    def __init__(self, interval, span, fetch_klines):
+        self.interval = interval
+        self.span = span
+        self.fetch_klines = fetch_klines
+        self.windows = {}
+        self.pending = {}
+
+    def seed(self, symbol):
+        klines = self.fetch_klines(symbol, self.span // self.interval + 1)
+        if not klines:
+            return None
+
+        window = RollingWindow(self.span)
+        for kline in klines[:-1]:
+            window.push(int(kline[0]), float(kline[3]), float(kline[2]))
+        self.windows[symbol] = window
+        self.pending[symbol] = klines[-1]
+        return window
+
+    def observe(self, symbol, kline):
+        window = self.windows.get(symbol)
+        if window is None:
+            return
+
+        pending = self.pending[symbol]
+        pending_timestamp = int(pending[0])
+        timestamp = int(kline[0])
+        if timestamp > pending_timestamp:
+            if timestamp - pending_timestamp > self.interval:
+                del self.windows[symbol]
+                return
+            window.push(pending_timestamp, float(pending[3]), float(pending[2]))
+        if timestamp >= pending_timestamp:
+            self.pending[symbol] = kline
+
+    def increase(self, symbol, kline):
+        self.observe(symbol, kline)
+        window = self.windows.get(symbol) or self.seed(symbol)
+        if window is None:
+            return None
+
+        window.evict(int(kline[0]))
+        low = float(kline[3])
+        if window.lows and window.low() < low:
+            low = window.low()
+        return float(kline[4]) / low - 1
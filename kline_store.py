@@ -0,0 +1,122 @@
+import json
+import os
+import threading
+from time import time
+from urllib.parse import urlencode
+
+import numpy
+
+import utils
+
+kline_dtype = numpy.dtype([('open_time', 'i8'), ('open', 'f8'), ('high', 'f8'), ('low', 'f8'),
+                           ('close', 'f8'), ('volume', 'f8'), ('close_time', 'i8')])
+
+
+def to_array(klines):
+    return numpy.array([(int(kline[0]), float(kline[1]), float(kline[2]), float(kline[3]),
+                         float(kline[4]), float(kline[5]), int(kline[6])) for kline in klines], dtype=kline_dtype)
+
+
+class KlineStore(object):
+    root = 'klines'
+    page_limit = 1000
+
+    def __init__(self, session, base_url, root=None, log=None):
+        self.session = session
+        self.base_url = base_url
+        if root:
+            self.root = root
+        self.log = log or (lambda symbol, msg: None)
+        self.locks = {}
+        self.lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, symbol, interval):
+        return os.path.join(self.root, '{}-{}.bin'.format(symbol, interval))
+
+    def series_lock(self, symbol, interval):
+        with self.lock:
+            return self.locks.setdefault((symbol, interval), threading.Lock())
+
+    def load(self, symbol, interval):
+        path = self.path(symbol, interval)
+        if not os.path.exists(path) or not os.path.getsize(path):
+            return numpy.empty(0, dtype=kline_dtype)
+        return numpy.memmap(path, dtype=kline_dtype, mode='r')
+
+    def load_meta(self, symbol, interval):
+        path = self.path(symbol, interval)[:-4] + '.json'
+        if not os.path.exists(path):
+            return {}
+        with open(path) as meta_file:
+            return json.load(meta_file)
+
+    def save_meta(self, symbol, interval, meta):
+        with open(self.path(symbol, interval)[:-4] + '.json', 'w') as meta_file:
+            json.dump(meta, meta_file)
+
+    def fetch(self, symbol, interval, start_time, end_time):
+        interval_ms = utils.interval_to_milliseconds(interval)
+        now = int(time() * 1000)
+        pages = []
+        while start_time <= end_time:
+            kline_data = {'symbol': symbol, 'interval': interval, 'startTime': int(start_time),
+                          'endTime': int(end_time), 'limit': self.page_limit}
+            response = self.session.get('{}/api/v1/klines?{}'.format(self.base_url, urlencode(kline_data)))
+
+            if response.status_code != 200:
+                raise RuntimeError('Failed to get {} {} klines. status code: {}'.format(
+                    symbol, interval, response.status_code))
+
+            klines = response.json()
+            if not klines:
+                break
+            pages.append(to_array(klines))
+            start_time = int(klines[-1][0]) + interval_ms
+            if len(klines) < self.page_limit:
+                break
+
+        if not pages:
+            return numpy.empty(0, dtype=kline_dtype)
+        klines = numpy.concatenate(pages)
+        return klines[klines['close_time'] < now]
+
+    def update(self, symbol, interval, start_time, end_time=None):
+        interval_ms = utils.interval_to_milliseconds(interval)
+        end_time = end_time or int(time() * 1000)
+        path = self.path(symbol, interval)
+
+        with self.series_lock(symbol, interval):
+            stored = self.load(symbol, interval)
+            meta = self.load_meta(symbol, interval)
+            covered_from = meta.get('start', stored['open_time'][0] if len(stored) else None)
+
+            if covered_from is None:
+                klines = self.fetch(symbol, interval, start_time, end_time)
+                klines.tofile(path)
+                self.save_meta(symbol, interval, {'start': int(start_time)})
+                return
+
+            if start_time < covered_from:
+                head = self.fetch(symbol, interval, start_time, (stored['open_time'][0] if len(stored)
+                                                                 else covered_from) - 1)
+                if len(head):
+                    numpy.concatenate([head, stored]).tofile(path + '.tmp')
+                    os.replace(path + '.tmp', path)
+                self.save_meta(symbol, interval, {'start': int(start_time)})
+                stored = self.load(symbol, interval)
+
+            next_open_time = stored['open_time'][-1] + interval_ms if len(stored) else covered_from
+            if next_open_time + interval_ms <= end_time:
+                tail = self.fetch(symbol, interval, next_open_time, end_time)
+                if len(tail):
+                    with open(path, 'ab') as kline_file:
+                        tail.tofile(kline_file)
+
+    def query(self, symbol, interval, start_time, end_time=None, refresh=True):
+        end_time = end_time or int(time() * 1000)
+        if refresh:
+            self.update(symbol, interval, start_time, end_time)
+        klines = self.load(symbol, interval)
+        open_times = klines['open_time']
+        return klines[numpy.searchsorted(open_times, start_time):numpy.searchsorted(open_times, end_time)]
@@ -0,0 +1,79 @@
+import threading
+from time import sleep
+
+
+class BalanceLedger(object):
+    reconcile_interval = 300
+    drift_tolerance = 1e-8
+
+    def __init__(self, get_account_info, reconcile_interval=None, log=None, balances=None, lock=None):
+        self.get_account_info = get_account_info
+        if reconcile_interval:
+            self.reconcile_interval = reconcile_interval
+        self.log = log or (lambda symbol, msg: None)
+        self.balances = {} if balances is None else balances
+        self.running = False
+        self.lock = lock or threading.Lock()
+
+    def free(self, asset):
+        return self.balances.get(asset, 0)
+
+    def reconcile(self):
+        account_info = self.get_account_info()
+        balances = {balance['asset']: float(balance['free']) for balance in account_info['balances']}
+
+        with self.lock:
+            current = self.balances.copy()
+            drifted = [asset for asset in set(balances) | set(current)
+                       if abs(balances.get(asset, 0) - current.get(asset, 0)) > self.drift_tolerance]
+            seeded = bool(current)
+            self.balances.update(balances)
+            for asset in set(current) - set(balances):
+                del self.balances[asset]
+
+        if seeded and drifted:
+            self.log('Ledger', 'Reconciled balances drifted for: {}'.format(sorted(drifted)))
+
+    def apply_order(self, symbol, side, order_info):
+        base_change = 0
+        quote_change = 0
+        commissions = {}
+        for fill in order_info.get('fills', []):
+            quantity = float(fill['qty'])
+            base_change += quantity
+            quote_change += float(fill['price']) * quantity
+            commissions[fill['commissionAsset']] = commissions.get(fill['commissionAsset'], 0) + \
+                float(fill['commission'])
+
+        if side == 'BUY':
+            quote_change = -quote_change
+        else:
+            base_change = -base_change
+
+        with self.lock:
+            self.balances[symbol.base_asset] = self.free(symbol.base_asset) + base_change
+            self.balances[symbol.quote_asset] = self.free(symbol.quote_asset) + quote_change
+            for asset, commission in commissions.items():
+                self.balances[asset] = self.free(asset) - commission
+
+    def apply_account_position(self, event):
+        with self.lock:
+            for balance in event['B']:
+                self.balances[balance['a']] = float(balance['f'])
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        while self.running:
+            sleep(self.reconcile_interval)
+            if not self.running:
+                break
+            try:
+                self.reconcile()
+            except Exception as e:
+                self.log('ERROR', 'Failed to reconcile balances: {}'.format(e))
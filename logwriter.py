@@ -0,0 +1,100 @@
+import atexit
+import json
+import os
+import queue
+import threading
+from datetime import datetime
+from time import time
+
+
+class LogFile(object):
+
+    def __init__(self, path, max_bytes, backup_count):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.handle = open(path, 'a', buffering=1024 * 1024)
+
+    def write(self, line):
+        self.handle.write(line)
+        if self.max_bytes and self.handle.tell() >= self.max_bytes:
+            self.rotate()
+
+    def flush(self):
+        self.handle.flush()
+
+    def close(self):
+        self.handle.close()
+
+    def rotate(self):
+        self.handle.close()
+        for index in range(self.backup_count - 1, 0, -1):
+            source = '{}.{}'.format(self.path, index)
+            if os.path.exists(source):
+                os.replace(source, '{}.{}'.format(self.path, index + 1))
+        if self.backup_count:
+            os.replace(self.path, '{}.1'.format(self.path))
+        self.handle = open(self.path, 'w', buffering=1024 * 1024)
+
+
+class LogWriter(object):
+    flush_size = 64 * 1024
+    flush_interval = 1
+    max_bytes = 50 * 1024 * 1024
+    backup_count = 5
+
+    def __init__(self, path='main.log', structured_path=None):
+        self.path = os.path.abspath(path)
+        self.structured_path = structured_path and os.path.abspath(structured_path)
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def write(self, symbol, msg, **fields):
+        self.queue.put((datetime.now(), symbol, msg, fields))
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+    def run(self):
+        files = [LogFile(self.path, self.max_bytes, self.backup_count)]
+        structured_file = None
+        if self.structured_path:
+            structured_file = LogFile(self.structured_path, self.max_bytes, self.backup_count)
+            files.append(structured_file)
+
+        pending = 0
+        flushed_at = time()
+        while True:
+            try:
+                record = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                record = False
+
+            if record is None:
+                break
+
+            if record:
+                timestamp, symbol, msg, fields = record
+                line = '{}-{}: {}\n'.format(timestamp, symbol, msg)
+                files[0].write(line)
+                pending += len(line)
+
+                if structured_file:
+                    entry = {'time': timestamp.isoformat(), 'symbol': symbol, 'msg': msg}
+                    entry.update(fields)
+                    line = json.dumps(entry, default=str) + '\n'
+                    structured_file.write(line)
+                    pending += len(line)
+
+            if pending >= self.flush_size or (pending and time() - flushed_at >= self.flush_interval):
+                for log_file in files:
+                    log_file.flush()
+                pending = 0
+                flushed_at = time()
+
+        for log_file in files:
+            log_file.close()
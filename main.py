@@ -3,47 +3,98 @@ import concurrent.futures
 import hashlib
 import hmac
 import json
+import queue
 import threading
 from datetime import datetime
-from time import sleep
+from time import perf_counter, sleep
 from urllib.parse import urlencode
 
-import requests
-
+import client
+import indicators
+import ledger
+import logwriter
+import manager
+import metrics
+import positions
+import protection
+import registry
+import scheduler
 import utils
+from shard import shard_of, shard_path
 
 
 class Binance(object):
     trigger_percent = 0.09
     stop_loss_percent = 0.7
     already_increased_percent = 0.4
+    increase_lookback = '1d'
     take_profit_low_percent = 0.3
     take_profit_high_percent = 1
     kline_interval = '3m'
     base_symbol = 'ETH'
     asset_symbol = None
     total_earning = 0
-    assets = []
-    symbols = []
+    position_book = None
+    scheduler = None
     worker_num = 1
+    max_positions = None
     base_url = 'https://api.binance.com'
     api_key = None
     secret_key = None
     market_type = 'BULL'
     fluctuation_restrict = 1.3
+    scan_interval = 0.5
+    bull_operate_interval = 1
+    bear_operate_interval = 5
+    screen_interval = 1
+    kline_stream = None
+    user_data_stream = None
+    screener = None
+    protection = None
+    metrics_file = None
+    metrics_port = None
+    metrics_host = '127.0.0.1'
+    sweep_started = None
+    sweep_scanned = 0
+    shard = (0, 1)
+    shared = None
+    running = True
     lock = threading.Lock()
 
-    def __init__(self, config_file_path, market_type=None, worker_num=1):
+    def __init__(self, config_file_path, market_type=None, worker_num=1, use_stream=False, use_screener=False,
+                 shard=None, shared=None):
         with open(config_file_path) as config_file:
             config = json.load(config_file)
 
+        if shard:
+            self.shard = shard
+            self.shared = shared
+        shard_index, shard_count = self.shard
+        if shard_count > 1:
+            for key in ('log_file', 'structured_log_file', 'journal_file', 'metrics_file'):
+                if config.get(key):
+                    config[key] = shard_path(config[key], shard_index)
+            config.setdefault('log_file', shard_path('main.log', shard_index))
+            config.setdefault('journal_file', shard_path('positions.journal', shard_index))
+            if config.get('metrics_port'):
+                config['metrics_port'] += shard_index
+
         self.secret_key = config['secret_key'].encode()
         self.api_key = config['api_key']
+        self.base_url = config.get('base_url', self.base_url)
+        self.metrics = metrics.Metrics()
+        self.metrics_file = config.get('metrics_file')
+        self.metrics_port = config.get('metrics_port')
+        self.metrics_host = config.get('metrics_host', self.metrics_host)
+        self.log_writer = logwriter.LogWriter(config.get('log_file', 'main.log'), config.get('structured_log_file'))
 
         self.log('Main', 'Initializing...')
-        self.session = requests.session()
+        self.session = client.RateLimitedSession(config.get('weight_limit'), config.get('order_limit'), self.log,
+                                                 metrics=self.metrics, share=1 / shard_count)
+        self.position_manager = manager.PositionManager(self)
         self.market_type = market_type
         self.worker_num = worker_num
+        self.max_positions = config.get('max_positions') or worker_num
         if self.market_type == 'BEAR':
             self.fluctuation_restrict = 10000000000
             self.trigger_percent = 0.2
@@ -51,270 +102,536 @@ class Binance(object):
             self.base_symbol = 'USDT'
             self.asset_symbol = 'BTC'
         self.session.headers.update({'X-MBX-APIKEY': self.api_key})
-        self.symbols = [symbol for symbol in self.session.get(
-            '{}/api/v1/exchangeInfo'.format(self.base_url)).json()['symbols']
-                        if symbol['symbol'].endswith(self.base_symbol)]
-        if self.asset_symbol:
-            self.symbols = [symbol for symbol in self.symbols if symbol['baseAsset'] == self.asset_symbol]
-        self.get_account_info()
-
-    def log(self, symbol, msg):
-        with self.lock:
-            with open('main.log', 'a+') as log_file:
-                log_file.write('{}-{}: {}\n'.format(datetime.now(), symbol, msg))
+        self.registry = registry.SymbolRegistry(self.session, self.base_url, config.get('symbol_ttl'), self.log)
+        if not self.registry.refresh():
+            raise RuntimeError('Failed to get exchange info')
+        self.registry.add_listener(self.on_symbols_changed)
+        if use_stream:
+            self.scheduler = scheduler.ScanScheduler(min_interval=self.scan_interval)
+        else:
+            poll_weight = self.session.endpoint_weights['/api/v1/klines']
+            weight_budget = config.get('scan_weight_budget')
+            weight_budget = weight_budget / shard_count if weight_budget else \
+                poll_weight * 60 / self.scan_interval * self.worker_num
+            self.scheduler = scheduler.ScanScheduler(weight_budget, poll_weight)
+        for symbol in self.registry.values():
+            if self.is_tradable(symbol):
+                self.scheduler.add(symbol)
+        self.indicators = indicators.KlineIndicators(utils.interval_to_milliseconds(self.kline_interval),
+                                                     utils.interval_to_milliseconds(self.increase_lookback),
+                                                     self.get_klines)
+        if config.get('protective_orders'):
+            self.protection = protection.ProtectiveOrders(self, config.get('trailing_stop_percent'))
+        self.position_book = positions.PositionBook(config.get('journal_file', 'positions.journal'))
+        self.resume_positions()
+        if self.shared:
+            self.ledger = ledger.BalanceLedger(self.get_account_info, config.get('reconcile_interval'), self.log,
+                                               self.shared.balances, self.shared.lock)
+            self.shared.add_earning(self.total_earning)
+        else:
+            self.ledger = ledger.BalanceLedger(self.get_account_info, config.get('reconcile_interval'), self.log)
+        if use_stream:
+            import stream
+            self.kline_stream = stream.KlineStream(self.session, self.base_url,
+                                                   [symbol['symbol'] for symbol in self.registry.values()
+                                                    if self.is_tradable(symbol)],
+                                                   self.kline_interval, config.get('stream_url'), self.log)
+            if self.is_leader():
+                self.user_data_stream = stream.UserDataStream(self.session, self.base_url,
+                                                              config.get('stream_url'), self.log)
+                self.user_data_stream.add_listener(self.on_user_data)
+                self.user_data_stream.add_connect_listener(self.ledger.reconcile)
+        if use_screener:
+            import screener
+            self.screener = screener.MarketScreener(self.session, self.base_url, self.kline_interval, self.log)
+            self.candidates = queue.Queue()
+            self.pending_candidates = set()
+        self.ledger.reconcile()
+
+    def resume_positions(self):
+        self.position_book.load()
+        self.total_earning = self.position_book.total_earning
+        resumed = set()
+        for asset in self.position_book.values():
+            symbol = self.registry.get(asset.name)
+            if not symbol:
+                self.log('ERROR', 'Journaled position {} is no longer listed, not resuming it'.format(asset.name))
+                continue
+            if not asset.market_type:
+                asset.market_type = self.market_type or 'BULL'
+                self.log(asset.name, 'Journaled position has no market type, resuming it as {}'.format(
+                    asset.market_type))
+            self.log(asset.name, 'Resuming journaled position: {}'.format(asset))
+            if asset.orders and not self.protection:
+                self.protection = protection.ProtectiveOrders(self)
+            self.position_manager.add(asset, symbol)
+            resumed.add(asset.name)
+        for name in resumed:
+            self.scheduler.remove(name)
+
+    def log(self, symbol, msg, **fields):
+        if symbol == 'ERROR':
+            self.metrics.increment('logged_errors_total')
+        self.log_writer.write(symbol, msg, **fields)
+
+    def is_leader(self):
+        return self.shard[0] == 0
+
+    def is_tradable(self, symbol):
+        if not symbol['symbol'].endswith(self.base_symbol):
+            return False
+        if self.shard[1] > 1 and shard_of(symbol['symbol'], self.shard[1]) != self.shard[0]:
+            return False
+        return not self.asset_symbol or symbol['baseAsset'] == self.asset_symbol
+
+    def on_symbols_changed(self, listed, delisted):
+        for symbol in listed:
+            if self.is_tradable(symbol) and symbol['symbol'] not in self.position_manager:
+                self.log(symbol['symbol'], 'New trading pair listed, adding to monitor')
+                self.scheduler.add(symbol)
+
+    def on_user_data(self, event):
+        if event.get('e') == 'outboundAccountPosition':
+            self.ledger.apply_account_position(event)
+
+    def get_latest_kline(self, symbol_name):
+        if self.kline_stream:
+            kline = self.kline_stream.get(symbol_name)
+            if kline:
+                self.metrics.increment('kline_reads_total', source='stream')
+                return kline
+
+        self.metrics.increment('kline_reads_total', source='rest')
+        klines = self.get_klines(symbol_name, 1)
+        return klines[-1] if klines else None
+
+    def get_klines(self, symbol_name, limit):
+        kline_data = {'symbol': symbol_name, 'interval': self.kline_interval, 'limit': limit}
+        with self.metrics.time('stage_seconds', stage='kline_fetch'):
+            kline_response = self.session.get('{}/api/v1/klines?{}'.format(self.base_url, urlencode(kline_data)))
+
+        if kline_response.status_code != 200:
+            self.log('ERROR', 'Failed to get {} kline. status code: {}'.format(symbol_name,
+                                                                               kline_response.status_code))
+            return None
+        with self.metrics.time('stage_seconds', stage='kline_decode'):
+            return kline_response.json()
 
     def get_account_info(self):
-        data = self.generate_sign_data({})
-        response = self.session.get('{}/api/v3/account?{}'.format(self.base_url, urlencode(data)))
-        if response.status_code != 200:
-            raise RuntimeError('Failed to get account info')
-        return response.json()
+        with self.metrics.time('stage_seconds', stage='account_info'):
+            data = self.generate_sign_data({})
+            response = self.session.get('{}/api/v3/account?{}'.format(self.base_url, urlencode(data)))
+            if response.status_code != 200:
+                raise RuntimeError('Failed to get account info')
+            return response.json()
 
     def generate_sign_data(self, data):
-        data['timestamp'] = int(round(datetime.now().timestamp() * 1000))
-        data['recvWindow'] = 5000
-
-        signature = base64.b16encode(hmac.new(self.secret_key, urlencode(data).encode(),
-                                              digestmod=hashlib.sha256).digest())
-        data['signature'] = signature
-        return data
+        with self.metrics.time('stage_seconds', stage='sign'):
+            data['timestamp'] = int(round(datetime.now().timestamp() * 1000))
+            data['recvWindow'] = 5000
+            data['signature'] = self.signature(urlencode(data))
+            return data
+
+    def sign_query(self, query):
+        with self.metrics.time('stage_seconds', stage='sign'):
+            query = '{}&timestamp={}&recvWindow=5000'.format(query, int(round(datetime.now().timestamp() * 1000)))
+            return '{}&signature={}'.format(query, self.signature(query))
+
+    def signature(self, payload):
+        return base64.b16encode(hmac.new(self.secret_key, payload.encode(),
+                                         digestmod=hashlib.sha256).digest()).decode()
+
+    def symbol_rules(self, symbol):
+        if isinstance(symbol, registry.SymbolRules):
+            return symbol
+        return self.registry.rules(symbol if isinstance(symbol, str) else symbol['symbol'])
 
     def place_limit_order(self, symbol, side, quantity, order_type, price):
-        quantity = utils.order_precheck(symbol, quantity)
-        data = {'symbol': symbol['symbol'], 'side': side, 'quantity': quantity,
-                'type': order_type, 'price': price, 'timeInForce': 'GTC',
-                'newOrderRespType': 'FULL'}
+        rules = self.symbol_rules(symbol)
+        with self.metrics.time('stage_seconds', stage='order_precheck'):
+            checked_quantity = utils.order_precheck(rules, quantity) if rules else False
+        if not checked_quantity:
+            self.log('ERROR', 'Order rejected by precheck: {}, {}, {}'.format(getattr(rules, 'name', symbol),
+                                                                             quantity, side))
+            return
+        return self.submit_order(rules, side, checked_quantity, rules.limit_order(side, checked_quantity, order_type,
+                                                                                  rules.price(price)))
 
-        data = self.generate_sign_data(data)
-        order_response = self.session.post('{}/api/v3/order?{}'.format(self.base_url, urlencode(data)))
+    def place_market_order(self, symbol, side, quantity):
+        rules = self.symbol_rules(symbol)
+        with self.metrics.time('stage_seconds', stage='order_precheck'):
+            checked_quantity = utils.order_precheck(rules, quantity) if rules else False
+        if not checked_quantity:
+            self.log('ERROR', 'Order rejected by precheck: {}, {}, {}'.format(getattr(rules, 'name', symbol),
+                                                                             quantity, side))
+            return
+        return self.submit_order(rules, side, checked_quantity, rules.market_order(side, checked_quantity))
+
+    def place_stop_order(self, symbol, side, quantity, stop_price, price):
+        rules = self.symbol_rules(symbol)
+        checked_quantity = utils.order_precheck(rules, quantity) if rules else False
+        if not checked_quantity:
+            self.log('ERROR', 'Order rejected by precheck: {}, {}, {}'.format(getattr(rules, 'name', symbol),
+                                                                             quantity, side))
+            return
+        return self.submit_order(rules, side, checked_quantity,
+                                 rules.stop_order(side, checked_quantity, rules.price(stop_price), rules.price(price)),
+                                 filled=False)
+
+    def place_oco_order(self, symbol, side, quantity, price, stop_price, stop_limit_price):
+        rules = self.symbol_rules(symbol)
+        checked_quantity = utils.order_precheck(rules, quantity) if rules else False
+        if not checked_quantity:
+            self.log('ERROR', 'Order rejected by precheck: {}, {}, {}'.format(getattr(rules, 'name', symbol),
+                                                                             quantity, side))
+            return
+        query = self.sign_query(rules.oco_order(side, checked_quantity, rules.price(price), rules.price(stop_price),
+                                                rules.price(stop_limit_price)))
+        with self.metrics.time('stage_seconds', stage='order_request'):
+            response = self.session.post('{}/api/v3/order/oco?{}'.format(self.base_url, query))
 
-        if order_response.status_code != 200:
-            self.log('ERROR', 'Failed to place order: {}, {}, {}. {}'.format(symbol['symbol'], quantity, side,
-                                                                             order_response.content))
+        if response.status_code != 200:
+            self.metrics.increment('orders_total', side=side, result='rejected')
+            self.log('ERROR', 'Failed to place OCO order: {}, {}, {}. {}'.format(rules.name, checked_quantity, side,
+                                                                                 response.content))
             return
+        self.metrics.increment('orders_total', side=side, result='oco')
+        return response.json()
 
-        order_info = order_response.json()
+    def get_order(self, symbol_name, order_id):
+        query = self.sign_query(urlencode({'symbol': symbol_name, 'orderId': order_id}))
+        response = self.session.get('{}/api/v3/order?{}'.format(self.base_url, query))
+        if response.status_code != 200:
+            self.log('ERROR', 'Failed to get order {} of {}. {}'.format(order_id, symbol_name, response.content))
+            return
+        return response.json()
 
-        if order_info['status'] != 'FILLED':
-            self.log('ERROR', 'Failed to fill order: {}, {}, {}. {}'.format(symbol['symbol'], quantity, side,
-                                                                            order_info))
+    def cancel_order(self, symbol_name, order_id):
+        query = self.sign_query(urlencode({'symbol': symbol_name, 'orderId': order_id}))
+        response = self.session.delete('{}/api/v3/order?{}'.format(self.base_url, query))
+        if response.status_code != 200:
+            self.log('ERROR', 'Failed to cancel order {} of {}. {}'.format(order_id, symbol_name, response.content))
             return
-        return order_info
+        return response.json()
 
-    def place_market_order(self, symbol, side, quantity):
-        quantity = utils.order_precheck(symbol, quantity)
-        data = {'symbol': symbol['symbol'], 'side': side, 'quantity': quantity,
-                'type': 'MARKET', 'newOrderRespType': 'FULL'}
-        data = self.generate_sign_data(data)
-        order_response = self.session.post('{}/api/v3/order?{}'.format(self.base_url, urlencode(data)))
+    def cancel_order_list(self, symbol_name, order_list_id):
+        query = self.sign_query(urlencode({'symbol': symbol_name, 'orderListId': order_list_id}))
+        response = self.session.delete('{}/api/v3/orderList?{}'.format(self.base_url, query))
+        if response.status_code != 200:
+            self.log('ERROR', 'Failed to cancel order list {} of {}. {}'.format(order_list_id, symbol_name,
+                                                                                response.content))
+            return
+        return response.json()
+
+    def submit_order(self, rules, side, quantity, query, filled=True):
+        query = self.sign_query(query)
+        with self.metrics.time('stage_seconds', stage='order_request'):
+            order_response = self.session.post('{}/api/v3/order?{}'.format(self.base_url, query))
 
         if order_response.status_code != 200:
-            self.log('ERROR', 'Failed to place order: {}, {}, {}. {}'.format(symbol['symbol'], quantity, side,
+            self.metrics.increment('orders_total', side=side, result='rejected')
+            self.log('ERROR', 'Failed to place order: {}, {}, {}. {}'.format(rules.name, quantity, side,
                                                                              order_response.content))
             return
 
-        order_info = order_response.json()
+        with self.metrics.time('stage_seconds', stage='order_decode'):
+            order_info = order_response.json()
+        self.ledger.apply_order(rules, side, order_info)
 
-        if order_info['status'] != 'FILLED':
-            self.log('ERROR', 'Failed to fill order: {}, {}, {}. {}'.format(symbol['symbol'], quantity, side,
+        self.metrics.increment('orders_total', side=side, result=order_info['status'].lower())
+        if filled and order_info['status'] != 'FILLED':
+            self.log('ERROR', 'Failed to fill order: {}, {}, {}. {}'.format(rules.name, quantity, side,
                                                                             order_info))
             return
         return order_info
 
     def monitor(self):
         self.log('Monitor', 'Starting to monitor trading pairs')
-        while self.symbols:
-            asset = {}
-            symbol = self.symbols.pop(0)
-            kline_data = {'symbol': symbol['symbol'], 'interval': self.kline_interval, 'limit': 1}
-            kline_response = self.session.get('{}/api/v1/klines?{}'.format(self.base_url, urlencode(kline_data)))
+        if self.screener:
+            return self.monitor_candidates()
 
-            if kline_response.status_code != 200:
-                self.log('ERROR', 'Failed to get {} kline. status code: {}'.format(symbol['symbol'],
-                                                                                   kline_response.status_code))
-                self.symbols.append(symbol)
-                sleep(1)
+        while True:
+            symbol = self.scheduler.pop()
+            if not symbol:
+                break
+            name = symbol['symbol']
+            symbol = self.registry.get(name)
+
+            if not symbol or name in self.position_manager:
+                self.scheduler.release(name)
                 continue
 
-            klines = kline_response.json()
-            kline = klines[-1]
-            timestamp = int(kline[0])
-
-            sold_asset = next((possessed_asset for possessed_asset in self.assets
-                               if possessed_asset['name'] == symbol['symbol']), None)
-            if sold_asset and sold_asset['sold'] and sold_asset['buy_timestamp'] != timestamp:
-                self.log(sold_asset['name'],
-                         'Found sold pairs, removing from assets. asset lifecycle details: {}'.format(asset))
-                self.log('Monitor', 'Total earnings so far: {}'.format(self.total_earning))
-                self.assets.remove(sold_asset)
-
-            price_open = float(kline[1])
-            price_now = float(kline[4])
-
-            percent_fluctuation = price_now / price_open - 1
-
-            if not self.market_type:
-                if percent_fluctuation >= 0:
-                    self.market_type = 'BULL'
-                else:
-                    self.market_type = 'BEAR'
-                    self.fluctuation_restrict = 10000000000
-                    self.trigger_percent = 0.2
-
-            percent_fluctuation = abs(percent_fluctuation)
-
-            if self.trigger_percent <= percent_fluctuation < self.trigger_percent * self.fluctuation_restrict:
-                self.log(symbol['symbol'], 'Buy operation triggered, fluctuation: {}'.format(percent_fluctuation))
-                account_info = self.get_account_info()
-                balance = next((balance for balance in account_info['balances']
-                                if balance['asset'] == symbol['quoteAsset']))
-                balance_used = float(balance['free']) / self.worker_num
-
-                if float(symbol['filters'][0]['minPrice']) <= balance_used <= float(symbol['filters'][0]['maxPrice']):
-                    quantity = float(balance_used) / price_now
-                    order_info = self.place_market_order(symbol, 'BUY', quantity)
-
-                    if order_info:
-                        asset['buy_price'], asset['commission'] = utils.handle_order_data(order_info)
-                        asset['quantity'] = float(order_info['executedQty'])
-                        asset['name'] = symbol['symbol']
-                        asset['buy_timestamp'] = timestamp
-                        asset['sold'] = False
-                        asset['spent'] = asset['buy_price'] * asset['quantity']
-                        asset['earning'] = 0
-                        asset['quoteAsset'] = symbol['quoteAsset']
-                        asset['stop_loss_price'] = asset['buy_price'] * self.stop_loss_percent
-                        asset['profit_low_taken'] = False
-                        self.log(symbol['symbol'], 'Buy {} at price {} {}'.format(asset['quantity'],
-                                                                                  asset['buy_price'],
-                                                                                  asset['quoteAsset']))
-                        self.assets.append(asset)
-                        self.log(symbol['symbol'], 'Buy details: {}'.format(asset))
-                        if self.market_type == 'BULL':
-                            self.operator_bull(asset)
-                        else:
-                            self.operator_bear(asset)
-                        continue
-
-            self.symbols.append(symbol)
-            with self.lock:
-                for new_symbol in [symbol for symbol in self.session.get(
-                    '{}/api/v1/exchangeInfo'.format(self.base_url)).json()['symbols']
-                                if symbol['symbol'].endswith(self.base_symbol)]:
-                    if new_symbol['symbol'] not in [symbol['symbol'] for symbol in self.symbols] + \
-                            [asset['name'] for asset in self.assets]:
-                        self.symbols.append(new_symbol)
-            sleep(0.5)
-
-    def operator_bear(self, asset):
-        self.log(asset['name'], 'Starting to bear operate {}'.format(asset['name']))
-        while True:
-            kline_data = {'symbol': asset['name'], 'interval': self.kline_interval, 'limit': 1}
-            kline_response = self.session.get('{}/api/v1/klines?{}'.format(self.base_url, urlencode(kline_data)))
+            kline = self.get_latest_kline(name)
 
-            if kline_response.status_code != 200:
-                self.log('ERROR', 'Failed to get {} kline. status code: {}'.format(asset['name'],
-                                                                                   kline_response.status_code))
-                sleep(1)
+            if not kline:
+                self.scheduler.retry(symbol)
                 continue
-            kline = kline_response.json()[0]
-            timestamp = int(kline[0])
-            price_now = float(kline[4])
-
-            if asset['buy_timestamp'] < timestamp:
-                self.log(asset['name'], 'Sell triggered at price: {}'.format(price_now))
-                order_info = self.place_market_order(asset['name'], 'SELL', asset['quantity'])
-
-                if order_info:
-                    quantity = float(order_info['executedQty'])
-                    sell_price, commission = utils.handle_order_data(order_info)
-                    asset['commission'] += commission
-                    asset['earning'] += sell_price * quantity
-                    asset['quantity'] -= quantity
-                    asset['sold'] = True
-                    with self.lock:
-                        self.total_earning += asset['earning'] - asset['spent']
-                    self.log(asset['name'], 'Sell {} at price {} {}, earning: {}, total earning: {}'.format(
-                        quantity, sell_price, asset['quoteAsset'], asset['earning'], self.total_earning))
-                    break
-            sleep(5)
-
-    def operator_bull(self, asset):
-        self.log(asset['name'], 'Starting to bull operate {}'.format(asset['name']))
-        new_highest_price = 0
-        count = 0
+
+            with self.metrics.time('stage_seconds', stage='check_symbol'):
+                bought = self.check_symbol(symbol, kline)
+            if bought:
+                self.scheduler.release(name)
+            else:
+                self.scheduler.reschedule(symbol, abs(float(kline[4]) / float(kline[1]) - 1) / self.trigger_percent)
+            self.record_scan()
+
+    def monitor_candidates(self):
         while True:
-            kline_data = {'symbol': asset['name'], 'interval': self.kline_interval, 'limit': 1}
-            kline_response = self.session.get('{}/api/v1/klines?{}'.format(self.base_url, urlencode(kline_data)))
+            name = self.candidates.get()
+            if name is None:
+                break
+            symbol = self.registry.get(name)
 
-            if kline_response.status_code != 200:
-                self.log('ERROR', 'Failed to get {} kline. status code: {}'.format(asset['name'],
-                                                                                   kline_response.status_code))
-                sleep(1)
-                continue
-            kline = kline_response.json()[0]
-            price_now = float(kline[4])
-
-            price_fluctuation = price_now / asset['buy_price'] - 1
-            if not asset['profit_low_taken'] and price_fluctuation >= self.take_profit_low_percent:
-                self.log(asset['name'], 'Sell at profit {} triggered. Fluctuation: {}'.format(
-                    self.take_profit_low_percent, price_fluctuation))
-                order_info = self.place_market_order(asset['name'], 'SELL', asset['quantity'] * 0.5)
-
-                if order_info:
-                    quantity = float(order_info['executedQty'])
-                    sell_price, commission = utils.handle_order_data(order_info)
-                    asset['commission'] += commission
-                    asset['earning'] += sell_price * quantity
-                    asset['quantity'] -= quantity
-                    asset['profit_low_taken'] = True
-                    self.log(asset['name'], 'Sell {} at price {} {}, earning: {}'.format(
-                        quantity, sell_price, asset['quoteAsset'], asset['earning']))
-
-            if new_highest_price < price_now:
-                new_highest_price = price_now
-                count = 0
+            if symbol and name not in self.position_manager:
+                kline = self.get_latest_kline(name)
+                if kline:
+                    with self.metrics.time('stage_seconds', stage='check_symbol'):
+                        self.check_symbol(symbol, kline)
+
+            with self.lock:
+                self.pending_candidates.discard(name)
+
+    def screen(self):
+        self.log('Screener', 'Starting bulk market screening')
+        while self.running:
+            universe = set(symbol['symbol'] for symbol in self.registry.values()
+                           if self.is_tradable(symbol) and symbol['symbol'] not in self.position_manager)
+            try:
+                with self.metrics.time('stage_seconds', stage='screen'):
+                    candidates = self.screener.screen(universe, self.trigger_percent, self.fluctuation_restrict)
+                self.metrics.set('universe_symbols', len(universe))
+                self.metrics.increment('symbols_scanned_total', len(universe))
+            except Exception as e:
+                self.log('ERROR', 'Failed to screen market: {}'.format(e))
+                candidates = []
+
+            with self.lock:
+                candidates = [name for name in candidates if name not in self.pending_candidates]
+                self.pending_candidates.update(candidates)
+            for name in candidates:
+                self.candidates.put(name)
+            sleep(self.screen_interval)
+
+    def record_scan(self):
+        self.metrics.increment('symbols_scanned_total')
+        now = perf_counter()
+        with self.lock:
+            if self.sweep_started is None:
+                self.sweep_started = now
+            self.sweep_scanned += 1
+            universe = len(self.scheduler) + len(self.position_manager)
+            if self.sweep_scanned < universe:
+                return
+            elapsed = now - self.sweep_started
+            scanned = self.sweep_scanned
+            self.sweep_started = now
+            self.sweep_scanned = 0
+
+        self.metrics.observe('sweep_seconds', elapsed)
+        self.metrics.set('universe_symbols', universe)
+        if elapsed:
+            self.metrics.set('symbols_per_second', scanned / elapsed)
+
+    def check_symbol(self, symbol, kline):
+        if symbol['symbol'] in self.position_manager:
+            return False
+        timestamp = int(kline[0])
+        self.indicators.observe(symbol['symbol'], kline)
+        price_open = float(kline[1])
+        price_now = float(kline[4])
+
+        percent_fluctuation = price_now / price_open - 1
+
+        if not self.market_type:
+            if percent_fluctuation >= 0:
+                self.market_type = 'BULL'
             else:
-                count += 1
-
-            if count == 10:
-                self.log(asset['name'], 'Sell at profit {} triggered.'.format(price_fluctuation))
-                order_info = self.place_market_order(asset['name'], 'SELL', asset['quantity'])
-
-                if order_info:
-                    quantity = float(order_info['executedQty'])
-                    sell_price, commission = utils.handle_order_data(order_info)
-                    asset['commission'] += commission
-                    asset['earning'] += sell_price * quantity
-                    asset['sold'] = True
-                    with self.lock:
-                        self.total_earning += asset['earning'] - asset['spent']
-                    self.log(asset['name'], 'Sell {} at price {} {}, earning: {}, total earning: {}'.format(
-                        quantity, sell_price, asset['quoteAsset'], asset['earning'], self.total_earning))
-                    break
-
-            if price_now <= asset['stop_loss_price']:
-                self.log(asset['name'], 'Sell at stop loss {} triggered. Fluctuation: {}'.format(
-                    self.stop_loss_percent, price_fluctuation))
-                order_info = self.place_market_order(asset['name'], 'SELL', asset['quantity'])
-
-                if order_info:
-                    quantity = float(order_info['executedQty'])
-                    sell_price, commission = utils.handle_order_data(order_info)
-                    asset['commission'] += commission
-                    asset['earning'] += sell_price * quantity
-                    asset['sold'] = True
-                    with self.lock:
-                        self.total_earning += asset['earning'] - asset['spent']
-                    self.log(asset['name'], 'Sell {} at price {} {}, earning: {}, total earning: {}'.format(
-                        quantity, sell_price, asset['quoteAsset'], asset['earning'], self.total_earning))
-                    break
-            sleep(1)
+                self.market_type = 'BEAR'
+                self.fluctuation_restrict = 10000000000
+                self.trigger_percent = 0.2
+
+        percent_fluctuation = abs(percent_fluctuation)
+
+        if self.trigger_percent <= percent_fluctuation < self.trigger_percent * self.fluctuation_restrict:
+            slots = self.max_positions - len(self.position_manager)
+            rules = self.registry.rules(symbol['symbol'])
+            if slots <= 0 or not rules:
+                return False
+            balance_used = self.ledger.free(rules.quote_asset) / (slots * self.shard[1])
+            if not balance_used or balance_used < rules.min_notional:
+                return False
+
+            self.log(symbol['symbol'], 'Buy operation triggered, fluctuation: {}'.format(percent_fluctuation))
+            if self.already_increased_percent is not None:
+                increase = self.indicators.increase(symbol['symbol'], kline)
+                if increase is not None and increase >= self.already_increased_percent:
+                    self.log(symbol['symbol'], 'Buy skipped, already increased {} over {}'.format(
+                        increase, self.increase_lookback))
+                    return False
+
+            quantity = float(balance_used) / price_now
+            order_info = self.place_market_order(rules, 'BUY', quantity)
+
+            if order_info:
+                executed_quantity = float(order_info['executedQty'])
+                buy_price, commission = utils.handle_order_data(order_info)
+                asset = positions.Position(symbol['symbol'], rules.quote_asset, buy_price, timestamp,
+                                           executed_quantity - utils.commission_in(order_info, rules.base_asset),
+                                           commission=commission, spent=buy_price * executed_quantity,
+                                           stop_loss_price=buy_price * self.stop_loss_percent,
+                                           market_type=self.market_type)
+                self.log(symbol['symbol'], 'Buy {} at price {} {}'.format(asset.quantity,
+                                                                          asset.buy_price,
+                                                                          asset.quote_asset),
+                         event='buy', quantity=asset.quantity, price=asset.buy_price,
+                         quote_asset=asset.quote_asset, fluctuation=percent_fluctuation)
+                self.position_book.open(asset)
+                self.log(symbol['symbol'], 'Buy details: {}'.format(asset))
+                if self.protection and self.market_type == 'BULL':
+                    self.protection.protect(asset)
+                self.position_manager.add(asset, symbol)
+                return True
+        return False
+
+    def operate_interval(self, asset=None):
+        if asset is not None and asset.orders:
+            return self.protection.operate_interval
+        if (asset.market_type if asset is not None else self.market_type) == 'BULL':
+            return self.bull_operate_interval
+        return self.bear_operate_interval
+
+    def operate(self, asset, kline):
+        with self.metrics.time('stage_seconds', stage='operate'):
+            if asset.orders:
+                return self.operate_protected(asset, kline)
+            if asset.market_type == 'BULL':
+                return self.operate_bull(asset, kline)
+            return self.operate_bear(asset, kline)
+
+    def on_position_closed(self, asset, symbol):
+        self.log(asset.name, 'Position closed, resuming monitoring')
+        self.scheduler.add(symbol)
+
+    def sell_asset(self, asset, quantity):
+        order_info = self.place_market_order(asset.name, 'SELL', quantity)
+
+        if not order_info:
+            return None, None
+
+        quantity = float(order_info['executedQty'])
+        sell_price, commission = utils.handle_order_data(order_info)
+        asset.commission += commission
+        asset.earning += sell_price * quantity
+        asset.quantity -= quantity
+        return quantity, sell_price
+
+    def record_close(self, asset):
+        with self.lock:
+            self.total_earning = self.position_book.close(asset)
+        if self.shared:
+            self.total_earning = self.shared.add_earning(asset.earning - asset.spent)
+
+    def close_asset(self, asset, price_now):
+        rules = self.registry.rules(asset.name)
+        if rules and (not rules.quantity(asset.quantity) or asset.quantity * price_now < rules.min_notional):
+            self.log(asset.name, 'Remaining {} is below the minimum order size, closing as dust'.format(asset.quantity))
+            self.record_close(asset)
+            return True
+
+        quantity, sell_price = self.sell_asset(asset, asset.quantity)
+
+        if not quantity:
+            return False
+
+        self.record_close(asset)
+        self.log(asset.name, 'Sell {} at price {} {}, earning: {}, total earning: {}'.format(
+            quantity, sell_price, asset.quote_asset, asset.earning, self.total_earning),
+                 event='sell', quantity=quantity, price=sell_price, quote_asset=asset.quote_asset,
+                 earning=asset.earning, spent=asset.spent, total_earning=self.total_earning)
+        return True
+
+    def operate_protected(self, asset, kline):
+        self.protection.sync(asset, kline)
+        rules = self.registry.rules(asset.name)
+        if rules and not rules.quantity(asset.quantity) and not self.protection.is_open(asset):
+            self.record_close(asset)
+            self.log(asset.name, 'Protective orders filled, earning: {}, total earning: {}'.format(
+                asset.earning, self.total_earning),
+                     event='sell', quote_asset=asset.quote_asset, earning=asset.earning, spent=asset.spent,
+                     total_earning=self.total_earning)
+            return True
+
+        if not self.protection.is_open(asset):
+            self.log(asset.name, 'Protective orders are gone, falling back to polling')
+            asset.orders = None
+            self.position_book.update('protect', asset)
+            return False
+        self.protection.trail(asset, kline)
+        return False
+
+    def operate_bear(self, asset, kline):
+        timestamp = int(kline[0])
+        price_now = float(kline[4])
+
+        if asset.buy_timestamp < timestamp:
+            self.log(asset.name, 'Sell triggered at price: {}'.format(price_now))
+            return self.close_asset(asset, price_now)
+        return False
+
+    def operate_bull(self, asset, kline):
+        price_now = float(kline[4])
+
+        price_fluctuation = price_now / asset.buy_price - 1
+        if not asset.profit_low_taken and price_fluctuation >= self.take_profit_low_percent:
+            self.log(asset.name, 'Sell at profit {} triggered. Fluctuation: {}'.format(
+                self.take_profit_low_percent, price_fluctuation))
+            quantity, sell_price = self.sell_asset(asset, asset.quantity * 0.5)
+
+            if quantity:
+                asset.profit_low_taken = True
+                self.position_book.update('take_profit', asset)
+                self.log(asset.name, 'Sell {} at price {} {}, earning: {}'.format(
+                    quantity, sell_price, asset.quote_asset, asset.earning),
+                         event='take_profit', quantity=quantity, price=sell_price, quote_asset=asset.quote_asset,
+                         earning=asset.earning)
+
+        if asset.highest_price < price_now:
+            asset.highest_price = price_now
+            asset.count = 0
+        else:
+            asset.count += 1
+
+        if asset.count >= 10:
+            self.log(asset.name, 'Sell at profit {} triggered.'.format(price_fluctuation))
+            if self.close_asset(asset, price_now):
+                return True
+
+        if price_now <= asset.stop_loss_price:
+            self.log(asset.name, 'Sell at stop loss {} triggered. Fluctuation: {}'.format(
+                self.stop_loss_percent, price_fluctuation))
+            if self.close_asset(asset, price_now):
+                return True
+        return False
 
     def start(self):
         self.log('Main', 'Starting worker threads to monitor trading pairs. Worker number: {}'.format(self.worker_num))
-        with concurrent.futures.ThreadPoolExecutor(max_workers=self.worker_num) as executor:
+        if self.metrics_port is not None:
+            host, port = self.metrics.serve(self.metrics_host, self.metrics_port)
+            self.log('Main', 'Serving metrics on http://{}:{}/metrics'.format(host, port))
+        if self.metrics_file:
+            self.metrics.export(self.metrics_file)
+        self.registry.start()
+        if self.is_leader():
+            self.ledger.start()
+        if self.user_data_stream:
+            self.user_data_stream.start()
+        if self.kline_stream:
+            self.kline_stream.start()
+        self.position_manager.start()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.worker_num + 1) as executor:
             monitor_futures = [executor.submit(self.monitor) for _ in range(self.worker_num)]
+            if self.screener:
+                monitor_futures.append(executor.submit(self.screen))
 
             for future in concurrent.futures.as_completed(monitor_futures):
                 try:
@@ -322,8 +639,26 @@ class Binance(object):
                 except:
                     raise
 
+    def stop(self):
+        self.running = False
+        self.scheduler.stop()
+        self.position_manager.stop()
+        self.registry.stop()
+        self.ledger.stop()
+        for stream in (self.kline_stream, self.user_data_stream):
+            if stream:
+                stream.stop()
+        if self.screener:
+            for _ in range(self.worker_num):
+                self.candidates.put(None)
+        self.log_writer.close()
+
 
 if __name__ == '__main__':
     binance = Binance('config.json', worker_num=1)
     # binance = Binance('config.json', 'BEAR', 1)
+    # binance = Binance('config.json', worker_num=1, use_stream=True)
+    # binance = Binance('config.json', worker_num=1, use_screener=True)
     binance.start()
+    # import shard
+    # shard.run('config.json', worker_num=1, processes=4)
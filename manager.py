@@ -0,0 +1,80 @@
+import heapq
+import threading
+from time import time
+
+
+class PositionManager(object):
+    retry_interval = 1
+
+    def __init__(self, binance):
+        self.binance = binance
+        self.positions = {}
+        self.schedule = []
+        self.running = False
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, name):
+        return name in self.positions
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def add(self, asset, symbol):
+        with self.condition:
+            self.positions[asset.name] = (asset, symbol)
+            heapq.heappush(self.schedule, (time(), asset.name))
+            self.condition.notify()
+
+    def pop_due(self):
+        with self.condition:
+            while self.running:
+                now = time()
+                if self.schedule and self.schedule[0][0] <= now:
+                    break
+                self.condition.wait(self.schedule[0][0] - now if self.schedule else None)
+
+            due = []
+            now = time()
+            while self.running and self.schedule and self.schedule[0][0] <= now:
+                due.append(heapq.heappop(self.schedule)[1])
+            return due
+
+    def run(self):
+        self.binance.log('Manager', 'Starting position manager')
+        while self.running:
+            for name in self.pop_due():
+                asset, symbol = self.positions[name]
+                interval = self.evaluate(asset)
+
+                with self.condition:
+                    if interval is None:
+                        del self.positions[name]
+                    else:
+                        heapq.heappush(self.schedule, (time() + interval, name))
+                    self.binance.metrics.set('open_positions', len(self.positions))
+
+                if interval is None:
+                    self.binance.on_position_closed(asset, symbol)
+
+    def evaluate(self, asset):
+        try:
+            kline = self.binance.get_latest_kline(asset.name)
+            if not kline:
+                return self.retry_interval
+            if self.binance.operate(asset, kline):
+                return None
+        except Exception as e:
+            self.binance.log('ERROR', 'Failed to operate {}: {}'.format(asset.name, e))
+            return self.retry_interval
+        return self.binance.operate_interval(asset)
@@ -0,0 +1,171 @@
+import bisect
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter, sleep
+
+default_buckets = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5,
+                   5, 10, 30)
+
+
+class Histogram(object):
+
+    def __init__(self, buckets=default_buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        if not self.count:
+            return 0
+        rank = q * self.count
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index else 0
+                if index == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return self.buckets[-1]
+
+
+class Timer(object):
+
+    def __init__(self, metrics, name, labels):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.elapsed = perf_counter() - self.started
+        self.metrics.observe(self.name, self.elapsed, **self.labels)
+        if exc_type:
+            self.metrics.increment('errors_total', stage=self.labels.get('stage', self.name))
+
+
+class Metrics(object):
+    prefix = 'binance'
+    quantiles = (0.5, 0.99)
+    export_interval = 15
+
+    def __init__(self, prefix=None):
+        if prefix:
+            self.prefix = prefix
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.server = None
+        self.lock = threading.Lock()
+
+    def time(self, name, **labels):
+        return Timer(self, name, labels)
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if not histogram:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def increment(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.gauges[key] = value
+
+    def format_labels(self, labels, extra=()):
+        labels = tuple(labels) + tuple(extra)
+        if not labels:
+            return ''
+        return '{{{}}}'.format(','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+                                        for name, value in labels))
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for kind, values in (('counter', self.counters), ('gauge', self.gauges)):
+                families = {}
+                for (name, labels), value in values.items():
+                    families.setdefault(name, []).append((labels, value))
+                for name, samples in sorted(families.items()):
+                    lines.append('# TYPE {}_{} {}'.format(self.prefix, name, kind))
+                    for labels, value in sorted(samples):
+                        lines.append('{}_{}{} {}'.format(self.prefix, name, self.format_labels(labels), value))
+
+            families = {}
+            for (name, labels), histogram in self.histograms.items():
+                families.setdefault(name, []).append((labels, histogram))
+            for name, samples in sorted(families.items()):
+                metric = '{}_{}'.format(self.prefix, name)
+                lines.append('# TYPE {} histogram'.format(metric))
+                for labels, histogram in sorted(samples, key=lambda sample: sample[0]):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                        cumulative += count
+                        lines.append('{}_bucket{} {}'.format(metric, self.format_labels(labels, (('le', bound),)),
+                                                             cumulative))
+                    lines.append('{}_sum{} {}'.format(metric, self.format_labels(labels), histogram.sum))
+                    lines.append('{}_count{} {}'.format(metric, self.format_labels(labels), histogram.count))
+
+                lines.append('# TYPE {}_quantile gauge'.format(metric))
+                for labels, histogram in sorted(samples, key=lambda sample: sample[0]):
+                    for q in self.quantiles:
+                        lines.append('{}_quantile{} {}'.format(metric, self.format_labels(labels, (('quantile', q),)),
+                                                               histogram.quantile(q)))
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        temporary_path = '{}.tmp'.format(path)
+        with open(temporary_path, 'w') as metrics_file:
+            metrics_file.write(self.render())
+        os.replace(temporary_path, path)
+
+    def export(self, path, interval=None):
+        interval = interval or self.export_interval
+
+        def run():
+            while True:
+                sleep(interval)
+                self.write(path)
+        threading.Thread(target=run, daemon=True).start()
+
+    def serve(self, host='127.0.0.1', port=0):
+        handler = type('Handler', (MetricsHandler,), {'metrics': self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.server.server_address
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    metrics = None
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+
+
+class Position(object):
+    __slots__ = ('name', 'quote_asset', 'buy_price', 'buy_timestamp', 'quantity', 'commission', 'spent', 'earning',
+                 'stop_loss_price', 'profit_low_taken', 'highest_price', 'count', 'sold', 'orders', 'market_type')
+
+    def __init__(self, name, quote_asset, buy_price, buy_timestamp, quantity, commission=0, spent=0, earning=0,
+                 stop_loss_price=0, profit_low_taken=False, highest_price=0, count=0, sold=False, orders=None,
+                 market_type=None):
+        self.name = name
+        self.quote_asset = quote_asset
+        self.buy_price = buy_price
+        self.buy_timestamp = buy_timestamp
+        self.quantity = quantity
+        self.commission = commission
+        self.spent = spent
+        self.earning = earning
+        self.stop_loss_price = stop_loss_price
+        self.profit_low_taken = profit_low_taken
+        self.highest_price = highest_price
+        self.count = count
+        self.sold = sold
+        self.orders = orders
+        self.market_type = market_type
+
+    def __repr__(self):
+        return 'Position({})'.format(', '.join('{}={!r}'.format(name, getattr(self, name)) for name in self.__slots__))
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class PositionBook(object):
+    fsync = False
+
+    def __init__(self, path='positions.journal'):
+        self.path = os.path.abspath(path)
+        self.positions = {}
+        self.total_earning = 0
+        self.journal = None
+        self.lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self.positions
+
+    def __len__(self):
+        return len(self.positions)
+
+    def get(self, name):
+        return self.positions.get(name)
+
+    def values(self):
+        return list(self.positions.values())
+
+    def load(self):
+        positions = {}
+        total_earning = 0
+        if os.path.exists(self.path):
+            with open(self.path) as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break
+                    if entry['event'] == 'earning':
+                        total_earning = entry['total_earning']
+                        continue
+
+                    position = Position(**entry['position'])
+                    if entry['event'] == 'sell':
+                        positions.pop(position.name, None)
+                        total_earning += position.earning - position.spent
+                    else:
+                        positions[position.name] = position
+
+        with self.lock:
+            self.positions = positions
+            self.total_earning = total_earning
+            self.compact()
+        return self.values()
+
+    def compact(self):
+        if self.journal:
+            self.journal.close()
+        temporary_path = '{}.tmp'.format(self.path)
+        with open(temporary_path, 'w') as journal:
+            journal.write(json.dumps({'event': 'earning', 'total_earning': self.total_earning}) + '\n')
+            for position in self.positions.values():
+                journal.write(json.dumps({'event': 'buy', 'position': position.to_dict()}) + '\n')
+        os.replace(temporary_path, self.path)
+        self.journal = open(self.path, 'a')
+
+    def append(self, event, position):
+        self.journal.write(json.dumps({'event': event, 'position': position.to_dict()}) + '\n')
+        self.journal.flush()
+        if self.fsync:
+            os.fsync(self.journal.fileno())
+
+    def open(self, position):
+        with self.lock:
+            self.positions[position.name] = position
+            self.append('buy', position)
+
+    def update(self, event, position):
+        with self.lock:
+            self.append(event, position)
+
+    def close(self, position):
+        with self.lock:
+            position.sold = True
+            self.positions.pop(position.name, None)
+            self.total_earning += position.earning - position.spent
+            self.append('sell', position)
+            return self.total_earning
@@ -0,0 +1,149 @@
+class ProtectiveOrders(object):
+    stop_limit_offset = 0.005
+    trailing_stop_percent = 0.1
+    trailing_replace_percent = 0.01
+    operate_interval = 10
+    list_roles = ('list_id', 'take_profit_id', 'list_stop_id')
+    order_roles = ('take_profit_id', 'list_stop_id', 'stop_id')
+
+    def __init__(self, binance, trailing_stop_percent=None):
+        self.binance = binance
+        if trailing_stop_percent:
+            self.trailing_stop_percent = trailing_stop_percent
+        self.synced_klines = {}
+
+    def take_profit_price(self, asset):
+        return asset.buy_price * (1 + self.binance.take_profit_low_percent)
+
+    def is_open(self, asset):
+        return bool(asset.orders) and any(role in asset.orders for role in self.order_roles)
+
+    def protect(self, asset):
+        binance = self.binance
+        rules = binance.registry.rules(asset.name)
+        if not rules:
+            return False
+
+        stop_limit_price = asset.stop_loss_price * (1 - self.stop_limit_offset)
+        orders = {}
+        quantity = asset.quantity
+        if not asset.profit_low_taken:
+            take_profit_quantity = rules.quantity(quantity * 0.5)
+            remaining = quantity - float(take_profit_quantity) if take_profit_quantity else 0
+            if not take_profit_quantity or not rules.quantity(remaining):
+                take_profit_quantity, remaining = quantity, 0
+
+            order_list = binance.place_oco_order(rules, 'SELL', float(take_profit_quantity),
+                                                 self.take_profit_price(asset), asset.stop_loss_price,
+                                                 stop_limit_price)
+            if not order_list:
+                return False
+            reports = {report['type']: report['orderId'] for report in order_list['orderReports']}
+            orders.update(list_id=order_list['orderListId'], take_profit_id=reports['LIMIT_MAKER'],
+                          list_stop_id=reports['STOP_LOSS_LIMIT'])
+            quantity = remaining
+
+        if quantity:
+            order = binance.place_stop_order(rules, 'SELL', quantity, asset.stop_loss_price, stop_limit_price)
+            if not order:
+                asset.orders = orders
+                self.cancel(asset)
+                asset.orders = None
+                return False
+            orders['stop_id'] = order['orderId']
+
+        asset.orders = orders
+        binance.position_book.update('protect', asset)
+        binance.log(asset.name, 'Protective orders placed, stop at {}'.format(asset.stop_loss_price),
+                    event='protect', stop_price=asset.stop_loss_price, orders=orders)
+        return True
+
+    def cancel(self, asset):
+        orders = asset.orders
+        if 'list_id' in orders and self.binance.cancel_order_list(asset.name, orders['list_id']):
+            for role in self.list_roles:
+                orders.pop(role, None)
+        if 'stop_id' in orders and self.binance.cancel_order(asset.name, orders['stop_id']):
+            del orders['stop_id']
+        return not self.is_open(asset)
+
+    def sync(self, asset, kline, force=False):
+        orders = asset.orders
+        timestamp = int(kline[0])
+        if force or self.synced_klines.get(asset.name) != timestamp:
+            roles = list(self.order_roles)
+        else:
+            roles = []
+            if float(kline[2]) >= self.take_profit_price(asset):
+                roles.append('take_profit_id')
+            if float(kline[3]) <= asset.stop_loss_price:
+                roles.extend(('list_stop_id', 'stop_id'))
+        self.synced_klines[asset.name] = timestamp
+
+        changed = False
+        for role in roles:
+            if role not in orders:
+                continue
+            order = self.binance.get_order(asset.name, orders[role])
+            if not order or order['status'] in ('NEW', 'PARTIALLY_FILLED'):
+                continue
+
+            changed = True
+            if order['status'] == 'FILLED':
+                for finished_role in (self.list_roles if role in self.list_roles else (role,)):
+                    orders.pop(finished_role, None)
+                self.apply_fill(asset, order, role)
+                continue
+
+            del orders[role]
+            if role in self.list_roles:
+                roles.extend(sibling for sibling in self.list_roles[1:] if sibling in orders and sibling not in roles)
+                if not any(sibling in orders for sibling in self.list_roles[1:]):
+                    orders.pop('list_id', None)
+
+        if changed:
+            self.binance.position_book.update('protect', asset)
+
+    def apply_fill(self, asset, order, role):
+        binance = self.binance
+        quantity = float(order['executedQty'])
+        earning = float(order['cummulativeQuoteQty'])
+        sell_price = earning / quantity
+        asset.quantity -= quantity
+        asset.earning += earning
+        try:
+            binance.ledger.reconcile()
+        except Exception as e:
+            binance.log('ERROR', 'Failed to reconcile balances after {} fill: {}'.format(asset.name, e))
+
+        if role == 'take_profit_id':
+            asset.profit_low_taken = True
+            binance.log(asset.name, 'Take profit order filled, sell {} at price {} {}, earning: {}'.format(
+                quantity, sell_price, asset.quote_asset, asset.earning),
+                        event='take_profit', quantity=quantity, price=sell_price, quote_asset=asset.quote_asset,
+                        earning=asset.earning)
+        else:
+            binance.log(asset.name, 'Stop order filled, sell {} at price {} {}'.format(
+                quantity, sell_price, asset.quote_asset))
+
+    def trail(self, asset, kline):
+        price_now = float(kline[4])
+        if price_now <= max(asset.highest_price, asset.buy_price):
+            return
+        asset.highest_price = price_now
+
+        stop_price = price_now * (1 - self.trailing_stop_percent)
+        if stop_price < asset.stop_loss_price * (1 + self.trailing_replace_percent):
+            return
+
+        self.cancel(asset)
+        if self.is_open(asset):
+            self.sync(asset, kline, force=True)
+            if self.is_open(asset):
+                return
+        asset.stop_loss_price = stop_price
+        asset.orders = None
+        rules = self.binance.registry.rules(asset.name)
+        if rules and rules.quantity(asset.quantity) and not self.protect(asset):
+            self.binance.log('ERROR', 'Failed to replace protective orders of {}, falling back to polling'.format(
+                asset.name))
@@ -0,0 +1,145 @@
+import threading
+from decimal import Decimal
+from time import sleep, time
+from urllib.parse import urlencode
+
+
+class SymbolRules(object):
+    __slots__ = ('name', 'base_asset', 'quote_asset', 'min_qty', 'max_qty', 'step_size', 'min_price', 'max_price',
+                 'tick_size', 'min_notional', 'templates')
+
+    def __init__(self, symbol):
+        filters = {symbol_filter['filterType']: symbol_filter for symbol_filter in symbol.get('filters', [])}
+        lot_size = filters.get('LOT_SIZE', {})
+        price_filter = filters.get('PRICE_FILTER', {})
+        notional = filters.get('MIN_NOTIONAL') or filters.get('NOTIONAL') or {}
+
+        self.name = symbol['symbol']
+        self.base_asset = symbol.get('baseAsset')
+        self.quote_asset = symbol.get('quoteAsset')
+        self.min_qty = Decimal(lot_size.get('minQty', '0'))
+        self.max_qty = Decimal(lot_size.get('maxQty', 'Infinity'))
+        self.step_size = Decimal(lot_size.get('stepSize', '0'))
+        self.min_price = float(price_filter.get('minPrice', 0))
+        self.max_price = float(price_filter.get('maxPrice', 0)) or float('inf')
+        self.tick_size = Decimal(price_filter.get('tickSize', '0'))
+        self.min_notional = float(notional.get('minNotional', 0))
+        self.templates = {}
+        for side in ('BUY', 'SELL'):
+            self.templates[side, 'MARKET'] = '{}&quantity='.format(urlencode(
+                {'symbol': self.name, 'side': side, 'type': 'MARKET', 'newOrderRespType': 'FULL'}))
+
+    def __repr__(self):
+        return 'SymbolRules({})'.format(self.name)
+
+    def quantity(self, quantity):
+        quantity = Decimal(repr(quantity))
+        if self.step_size:
+            quantity = quantity // self.step_size * self.step_size
+        if not self.min_qty <= quantity <= self.max_qty or not quantity:
+            return False
+        return quantity
+
+    def price(self, price):
+        price = Decimal(repr(price))
+        if self.tick_size:
+            price = price // self.tick_size * self.tick_size
+        return price
+
+    def market_order(self, side, quantity):
+        return '{}{:f}'.format(self.templates[side, 'MARKET'], quantity)
+
+    def limit_order(self, side, quantity, order_type, price):
+        template = self.templates.get((side, order_type))
+        if not template:
+            template = self.templates[side, order_type] = '{}&quantity={{:f}}&price={{:f}}'.format(urlencode(
+                {'symbol': self.name, 'side': side, 'type': order_type, 'timeInForce': 'GTC',
+                 'newOrderRespType': 'FULL'}))
+        return template.format(quantity, price)
+
+    def stop_order(self, side, quantity, stop_price, price):
+        return '{}&stopPrice={:f}'.format(self.limit_order(side, quantity, 'STOP_LOSS_LIMIT', price), stop_price)
+
+    def oco_order(self, side, quantity, price, stop_price, stop_limit_price):
+        return '{}&quantity={:f}&price={:f}&stopPrice={:f}&stopLimitPrice={:f}&stopLimitTimeInForce=GTC'.format(
+            urlencode({'symbol': self.name, 'side': side, 'newOrderRespType': 'FULL'}), quantity, price, stop_price,
+            stop_limit_price)
+
+
+class SymbolRegistry(object):
+    ttl = 300
+    retry_interval = 10
+
+    def __init__(self, session, base_url, ttl=None, log=None):
+        self.session = session
+        self.base_url = base_url
+        if ttl:
+            self.ttl = ttl
+        self.log = log or (lambda symbol, msg: None)
+        self.symbols = {}
+        self.symbol_rules = {}
+        self.listeners = []
+        self.refreshed_at = 0
+        self.running = False
+        self.lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self.symbols
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def get(self, name):
+        return self.symbols.get(name)
+
+    def rules(self, name):
+        return self.symbol_rules.get(name)
+
+    def values(self):
+        return list(self.symbols.values())
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def refresh(self):
+        response = self.session.get('{}/api/v1/exchangeInfo'.format(self.base_url))
+        if response.status_code != 200:
+            self.log('ERROR', 'Failed to refresh exchange info. status code: {}'.format(response.status_code))
+            return False
+
+        symbols = {symbol['symbol']: symbol for symbol in response.json()['symbols']
+                   if symbol.get('status', 'TRADING') == 'TRADING'}
+        symbol_rules = {name: SymbolRules(symbol) for name, symbol in symbols.items()}
+        with self.lock:
+            initial = not self.refreshed_at
+            listed = symbols.keys() - self.symbols.keys()
+            delisted = self.symbols.keys() - symbols.keys()
+            self.symbols = symbols
+            self.symbol_rules = symbol_rules
+            self.refreshed_at = time()
+
+        if not initial and (listed or delisted):
+            self.log('Registry', 'Symbols listed: {}, delisted: {}'.format(sorted(listed), sorted(delisted)))
+            for listener in self.listeners:
+                listener([symbols[name] for name in listed], delisted)
+        return True
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+
+    def run(self):
+        delay = self.ttl
+        while self.running:
+            sleep(delay)
+            if not self.running:
+                break
+            try:
+                refreshed = self.refresh()
+            except Exception as e:
+                self.log('ERROR', 'Failed to refresh exchange info: {}'.format(e))
+                refreshed = False
+            delay = self.ttl if refreshed else self.retry_interval
@@ -0,0 +1,117 @@
+import heapq
+import random
+import threading
+from time import time
+
+
+class ScanScheduler(object):
+    min_interval = 1
+    quiet_backoff = 2
+    quiet_ratio = 0.25
+    hot_ratio = 0.75
+    jitter = 0.2
+    burst = 5
+    hot_reserve = 2
+    hot_share = 0.5
+    retry_interval = 1
+
+    def __init__(self, weight_budget=None, poll_weight=1, min_interval=None):
+        self.weight_budget = weight_budget
+        self.poll_weight = poll_weight
+        if min_interval:
+            self.min_interval = min_interval
+        self.entries = {}
+        self.hot = []
+        self.hot_names = set()
+        self.schedule = []
+        self.tokens = self.burst
+        self.refilled_at = time()
+        self.running = True
+        self.condition = threading.Condition()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def add(self, symbol):
+        with self.condition:
+            entry = self.entries.get(symbol['symbol'])
+            if entry and entry[0] is not None:
+                self.entries[symbol['symbol']] = (entry[0], symbol)
+                return
+        self.push(symbol, 0)
+
+    def remove(self, name):
+        with self.condition:
+            self.entries.pop(name, None)
+            self.hot_names.discard(name)
+
+    def release(self, name):
+        with self.condition:
+            if name in self.entries and self.entries[name][0] is None:
+                del self.entries[name]
+                self.hot_names.discard(name)
+
+    def retry(self, symbol):
+        self.push(symbol, self.retry_interval)
+
+    def reschedule(self, symbol, heat):
+        ratio = min(max((heat - self.quiet_ratio) / (self.hot_ratio - self.quiet_ratio), 0), 1)
+        if ratio >= 1:
+            with self.condition:
+                self.hot_names.add(symbol['symbol'])
+                hot_interval = len(self.hot_names) * self.poll_spacing() / self.hot_share
+            self.push(symbol, max(self.min_interval, hot_interval), hot=True)
+            return
+        quiet = max(self.min_interval, len(self.entries) * self.poll_spacing() * self.quiet_backoff)
+        interval = quiet * (self.min_interval / quiet) ** ratio
+        self.push(symbol, max(self.min_interval, interval * random.uniform(1 - self.jitter, 1 + self.jitter)))
+
+    def push(self, symbol, delay, hot=False):
+        due = time() + delay
+        with self.condition:
+            self.entries[symbol['symbol']] = (due, symbol)
+            if not hot:
+                self.hot_names.discard(symbol['symbol'])
+            heapq.heappush(self.hot if hot else self.schedule, (due, symbol['symbol']))
+            self.condition.notify()
+
+    def poll_spacing(self):
+        if not self.weight_budget:
+            return 0
+        return self.poll_weight * 60 / self.weight_budget
+
+    def refill(self, now):
+        elapsed = now - self.refilled_at
+        self.refilled_at = now
+        spacing = self.poll_spacing()
+        self.tokens = min(self.burst, self.tokens + elapsed / spacing) if spacing else self.burst
+
+    def pop(self):
+        with self.condition:
+            while self.running:
+                now = time()
+                self.refill(now)
+                wait = None
+                for queue, reserve in ((self.hot, 0), (self.schedule, self.hot_reserve)):
+                    while queue and self.entries.get(queue[0][1], (None,))[0] != queue[0][0]:
+                        heapq.heappop(queue)
+                    if not queue:
+                        continue
+
+                    queue_wait = max(queue[0][0] - now, (1 + reserve - self.tokens) * self.poll_spacing())
+                    if queue_wait <= 0:
+                        name = heapq.heappop(queue)[1]
+                        symbol = self.entries[name][1]
+                        self.entries[name] = (None, symbol)
+                        self.tokens -= 1
+                        return symbol
+                    wait = queue_wait if wait is None else min(wait, queue_wait)
+                self.condition.wait(wait)
@@ -0,0 +1,54 @@
+from time import time
+
+import numpy
+
+import utils
+
+
+class MarketScreener(object):
+    screen_ratio = 0.8
+
+    def __init__(self, session, base_url, interval, log=None):
+        self.session = session
+        self.base_url = base_url
+        self.interval_ms = utils.interval_to_milliseconds(interval)
+        self.log = log or (lambda symbol, msg: None)
+        self.bucket = None
+        self.names = numpy.array([], dtype=object)
+        self.opens = numpy.array([])
+
+    def get_prices(self):
+        response = self.session.get('{}/api/v3/ticker/price'.format(self.base_url))
+        if response.status_code != 200:
+            self.log('ERROR', 'Failed to get ticker prices. status code: {}'.format(response.status_code))
+            return None, None
+
+        tickers = response.json()
+        names = numpy.array([ticker['symbol'] for ticker in tickers], dtype=object)
+        prices = numpy.array([ticker['price'] for ticker in tickers], dtype=float)
+        return names, prices
+
+    def align_opens(self, names, prices):
+        bucket = int(time() * 1000) // self.interval_ms
+        if bucket != self.bucket or len(names) != len(self.names) or (names != self.names).any():
+            opens = prices.copy()
+            if bucket == self.bucket:
+                previous = dict(zip(self.names, self.opens))
+                known = numpy.array([name in previous for name in names], dtype=bool)
+                opens[known] = [previous[name] for name in names[known]]
+            self.bucket = bucket
+            self.names = names
+            self.opens = opens
+        return self.opens
+
+    def screen(self, universe, trigger_percent, fluctuation_restrict):
+        names, prices = self.get_prices()
+        if names is None:
+            return []
+
+        opens = self.align_opens(names, prices)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            fluctuation = numpy.abs(prices / opens - 1)
+        mask = (fluctuation >= trigger_percent * self.screen_ratio) & \
+               (fluctuation < trigger_percent * fluctuation_restrict)
+        return [name for name in names[mask] if name in universe]
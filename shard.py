@@ -0,0 +1,57 @@
+import multiprocessing
+import os
+import zlib
+from time import sleep
+
+
+def shard_of(name, count):
+    return zlib.crc32(name.encode()) % count
+
+
+def shard_path(path, index):
+    root, extension = os.path.splitext(path)
+    return '{}.{}{}'.format(root, index, extension)
+
+
+class SharedState(object):
+
+    def __init__(self, manager):
+        self.balances = manager.dict()
+        self.lock = multiprocessing.Lock()
+        self.earning = multiprocessing.Value('d', 0)
+
+    def add_earning(self, earning):
+        with self.earning.get_lock():
+            self.earning.value += earning
+            return self.earning.value
+
+
+def run_shard(config_file_path, market_type, worker_num, use_stream, use_screener, index, count, shared):
+    import main
+
+    main.Binance(config_file_path, market_type, worker_num, use_stream, use_screener, shard=(index, count),
+                 shared=shared).start()
+
+
+def run(config_file_path, market_type=None, processes=None, worker_num=1, use_stream=False, use_screener=False):
+    processes = processes or os.cpu_count()
+    with multiprocessing.Manager() as manager:
+        shared = SharedState(manager)
+        workers = [multiprocessing.Process(target=run_shard, name='shard-{}'.format(index),
+                                           args=(config_file_path, market_type, worker_num, use_stream,
+                                                 use_screener, index, processes, shared))
+                   for index in range(processes)]
+        for worker in workers:
+            worker.start()
+
+        try:
+            while all(worker.is_alive() for worker in workers):
+                sleep(1)
+            exited = ['{} ({})'.format(worker.name, worker.exitcode) for worker in workers if not worker.is_alive()]
+        finally:
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+            for worker in workers:
+                worker.join()
+    raise RuntimeError('Shard processes exited: {}'.format(', '.join(exited)))
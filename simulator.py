@@ -0,0 +1,606 @@
+import argparse
+import base64
+import hashlib
+import itertools
+import json
+import os
+import select
+import socket
+import struct
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep, time
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy
+import requests
+
+import backtest
+import kline_store
+import utils
+
+
+class ReplayClock(object):
+
+    def __init__(self, start_time, speed=1):
+        self.start_time = start_time
+        self.speed = speed
+        self.started_at = time()
+
+    def now(self):
+        return int(self.start_time + (time() - self.started_at) * 1000 * self.speed)
+
+
+class SimulatedExchange(object):
+    commission = 0.001
+    tick_interval = '1m'
+    balances = {'ETH': 100, 'BTC': 10, 'USDT': 100000, 'BNB': 0}
+
+    def __init__(self, klines_by_symbol, clock, quote_assets=('ETH', 'BTC', 'USDT', 'BNB'), balances=None):
+        self.klines = klines_by_symbol
+        self.clock = clock
+        self.tick_ms = utils.interval_to_milliseconds(self.tick_interval)
+        self.symbols = {}
+        for name in self.klines:
+            quote_asset = next((quote for quote in quote_assets if name.endswith(quote)), name[-3:])
+            self.symbols[name] = {'symbol': name, 'status': 'TRADING', 'baseAsset': name[:-len(quote_asset)],
+                                  'quoteAsset': quote_asset, 'filters': [
+                                      {'filterType': 'PRICE_FILTER', 'minPrice': '0.00000001',
+                                       'maxPrice': '100000.00000000', 'tickSize': '0.00000001'},
+                                      {'filterType': 'LOT_SIZE', 'minQty': '0.00100000',
+                                       'maxQty': '90000000.00000000', 'stepSize': '0.00100000'},
+                                      {'filterType': 'MIN_NOTIONAL', 'minNotional': '0.00100000'}]}
+        self.free = dict(balances or self.balances)
+        self.locked = {}
+        self.orders = {}
+        self.order_lists = {}
+        self.order_ids = itertools.count(1)
+        self.order_list_ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def completed(self, symbol):
+        klines = self.klines[symbol]
+        return klines[:numpy.searchsorted(klines['open_time'], self.clock.now() - self.tick_ms, side='right')]
+
+    def price(self, symbol):
+        klines = self.completed(symbol)
+        if not len(klines):
+            return None
+        return float(klines['close'][-1])
+
+    def exchange_info(self):
+        return {'timezone': 'UTC', 'serverTime': self.clock.now(), 'symbols': list(self.symbols.values())}
+
+    def ticker_prices(self):
+        prices = [(symbol, self.price(symbol)) for symbol in self.symbols]
+        return [{'symbol': symbol, 'price': '{:.8f}'.format(price)} for symbol, price in prices if price]
+
+    def get_klines(self, symbol, interval, start_time=None, end_time=None, limit=500):
+        interval_ms = utils.interval_to_milliseconds(interval)
+        klines = self.completed(symbol)
+        if end_time is not None:
+            klines = klines[:numpy.searchsorted(klines['open_time'], (end_time // interval_ms + 1) * interval_ms)]
+        if start_time is not None:
+            klines = klines[numpy.searchsorted(klines['open_time'], -(-start_time // interval_ms) * interval_ms):]
+        elif len(klines):
+            klines = klines[numpy.searchsorted(klines['open_time'],
+                                               (klines['open_time'][-1] // interval_ms - limit + 1) * interval_ms):]
+        if not len(klines):
+            return []
+
+        buckets = klines['open_time'] // interval_ms
+        starts = numpy.flatnonzero(numpy.concatenate(([True], buckets[1:] != buckets[:-1])))
+        if len(starts) > limit:
+            if start_time is None:
+                klines = klines[starts[-limit]:]
+                starts = starts[-limit:] - starts[-limit]
+            else:
+                klines = klines[:starts[limit]]
+                starts = starts[:limit]
+        ends = numpy.concatenate((starts[1:], [len(klines)])) - 1
+
+        open_times = klines['open_time'][starts] // interval_ms * interval_ms
+        highs = numpy.maximum.reduceat(klines['high'], starts)
+        lows = numpy.minimum.reduceat(klines['low'], starts)
+        volumes = numpy.add.reduceat(klines['volume'], starts)
+        return [[int(open_time), '{:.8f}'.format(price_open), '{:.8f}'.format(high), '{:.8f}'.format(low),
+                 '{:.8f}'.format(price_close), '{:.8f}'.format(volume), int(open_time + interval_ms - 1),
+                 '0', 0, '0', '0', '0']
+                for open_time, price_open, high, low, price_close, volume in zip(
+                    open_times, klines['open'][starts], highs, lows, klines['close'][ends], volumes)]
+
+    def kline_event(self, symbol, interval):
+        klines = self.get_klines(symbol, interval, limit=1)
+        if not klines:
+            return None
+        kline = klines[-1]
+        return {'e': 'kline', 'E': self.clock.now(), 's': symbol,
+                'k': {'t': kline[0], 'T': kline[6], 's': symbol, 'i': interval, 'o': kline[1], 'c': kline[4],
+                      'h': kline[2], 'l': kline[3], 'v': kline[5], 'n': kline[8], 'x': kline[6] < self.clock.now(),
+                      'q': kline[7], 'V': kline[9], 'Q': kline[10], 'B': kline[11]}}
+
+    def account(self):
+        with self.lock:
+            return {'makerCommission': 10, 'takerCommission': 10, 'canTrade': True, 'updateTime': self.clock.now(),
+                    'balances': [{'asset': asset, 'free': '{:.8f}'.format(self.free.get(asset, 0)),
+                                  'locked': '{:.8f}'.format(self.locked.get(asset, 0))}
+                                 for asset in sorted(set(self.free) | set(self.locked))]}
+
+    def fill(self, order, price):
+        symbol = self.symbols[order['symbol']]
+        base, quote = symbol['baseAsset'], symbol['quoteAsset']
+        quantity = order['origQty']
+        if order['side'] == 'BUY':
+            commission, commission_asset = quantity * self.commission, base
+            self.free[base] = self.free.get(base, 0) + quantity - commission
+            self.free[quote] = self.free.get(quote, 0) + order['reserved'] - quantity * price
+            self.locked[quote] = self.locked.get(quote, 0) - order['reserved']
+        else:
+            commission, commission_asset = quantity * price * self.commission, quote
+            self.free[quote] = self.free.get(quote, 0) + quantity * price - commission
+            self.locked[base] = self.locked.get(base, 0) - order['reserved']
+        order.update({'status': 'FILLED', 'executedQty': quantity, 'cummulativeQuoteQty': quantity * price,
+                      'fills': [{'price': '{:.8f}'.format(price), 'qty': '{:.8f}'.format(quantity),
+                                 'commission': '{:.8f}'.format(commission), 'commissionAsset': commission_asset}]})
+
+    def reserve(self, order, price):
+        symbol = self.symbols[order['symbol']]
+        if order['side'] == 'BUY':
+            asset, amount = symbol['quoteAsset'], order['origQty'] * price
+        else:
+            asset, amount = symbol['baseAsset'], order['origQty']
+        if self.free.get(asset, 0) < amount:
+            return False
+        self.free[asset] -= amount
+        self.locked[asset] = self.locked.get(asset, 0) + amount
+        order['reserved'] = amount
+        return True
+
+    def release(self, order):
+        symbol = self.symbols[order['symbol']]
+        asset = symbol['quoteAsset'] if order['side'] == 'BUY' else symbol['baseAsset']
+        self.locked[asset] = self.locked.get(asset, 0) - order['reserved']
+        self.free[asset] = self.free.get(asset, 0) + order['reserved']
+
+    def marketable(self, order, price):
+        if order['type'] == 'MARKET':
+            return True
+        if order['type'] == 'STOP_LOSS_LIMIT':
+            if order['side'] == 'BUY':
+                return order['stopPrice'] <= price <= order['price']
+            return order['price'] <= price <= order['stopPrice']
+        if order['side'] == 'BUY':
+            return price <= order['price']
+        return price >= order['price']
+
+    def triggers_immediately(self, order, price):
+        if order['type'] == 'LIMIT_MAKER':
+            return self.marketable(order, price)
+        if order['type'] == 'STOP_LOSS_LIMIT':
+            return price >= order['stopPrice'] if order['side'] == 'BUY' else price <= order['stopPrice']
+        return False
+
+    def match(self):
+        for order in [order for order in self.orders.values() if order['status'] == 'NEW']:
+            price = self.price(order['symbol'])
+            if order['status'] == 'NEW' and price and self.marketable(order, price):
+                self.fill(order, price)
+                if 'orderListId' in order:
+                    self.finish_list(order['orderListId'], 'EXPIRED')
+
+    def finish_list(self, order_list_id, status):
+        order_list = self.order_lists[order_list_id]
+        for order_id in order_list['orders']:
+            order = self.orders[order_id]
+            if order['status'] == 'NEW':
+                order['status'] = status
+                order['reserved'] = 0
+        order_list['listOrderStatus'] = 'ALL_DONE'
+
+    def new_order(self, symbol, params, order_type, price=0, stop_price=0):
+        return {'symbol': symbol, 'orderId': next(self.order_ids), 'side': params.get('side'), 'type': order_type,
+                'origQty': float(params['quantity']), 'price': float(price), 'stopPrice': float(stop_price),
+                'status': 'NEW', 'executedQty': 0, 'cummulativeQuoteQty': 0, 'fills': [],
+                'transactTime': self.clock.now()}
+
+    def place_order(self, params):
+        symbol = params.get('symbol')
+        if symbol not in self.symbols:
+            return 400, {'code': -1121, 'msg': 'Invalid symbol.'}
+        try:
+            quantity = float(params['quantity'])
+        except (KeyError, ValueError):
+            return 400, {'code': -1013, 'msg': 'Invalid quantity.'}
+        price = self.price(symbol)
+        if not price:
+            return 400, {'code': -1013, 'msg': 'Market is closed.'}
+
+        order = self.new_order(symbol, params, params.get('type'), params.get('price', 0),
+                               params.get('stopPrice', 0))
+        if self.triggers_immediately(order, price):
+            return 400, {'code': -2010, 'msg': 'Order would trigger immediately.'}
+        with self.lock:
+            if not self.reserve(order, order['price'] if order['type'] != 'MARKET' and order['side'] == 'BUY'
+                                else price):
+                return 400, {'code': -2010, 'msg': 'Account has insufficient balance for requested action.'}
+            if self.marketable(order, price):
+                self.fill(order, price)
+            self.orders[order['orderId']] = order
+        return 200, self.format_order(order)
+
+    def place_oco(self, params):
+        symbol = params.get('symbol')
+        if symbol not in self.symbols:
+            return 400, {'code': -1121, 'msg': 'Invalid symbol.'}
+        try:
+            limit_maker = self.new_order(symbol, params, 'LIMIT_MAKER', params['price'])
+            stop_loss = self.new_order(symbol, params, 'STOP_LOSS_LIMIT', params['stopLimitPrice'],
+                                       params['stopPrice'])
+        except (KeyError, ValueError):
+            return 400, {'code': -1102, 'msg': 'Mandatory parameter was not sent or was malformed.'}
+        price = self.price(symbol)
+        if not price:
+            return 400, {'code': -1013, 'msg': 'Market is closed.'}
+        if self.triggers_immediately(limit_maker, price) or self.triggers_immediately(stop_loss, price):
+            return 400, {'code': -2010, 'msg': 'Order would trigger immediately.'}
+
+        order_list = {'orderListId': next(self.order_list_ids), 'contingencyType': 'OCO', 'symbol': symbol,
+                      'listStatusType': 'EXEC_STARTED', 'listOrderStatus': 'EXECUTING',
+                      'transactionTime': self.clock.now(), 'orders': [limit_maker['orderId'], stop_loss['orderId']]}
+        with self.lock:
+            if not self.reserve(limit_maker, limit_maker['price']):
+                return 400, {'code': -2010, 'msg': 'Account has insufficient balance for requested action.'}
+            stop_loss['reserved'] = limit_maker['reserved']
+            for order in (limit_maker, stop_loss):
+                order['orderListId'] = order_list['orderListId']
+                self.orders[order['orderId']] = order
+            self.order_lists[order_list['orderListId']] = order_list
+        return 200, self.format_order_list(order_list)
+
+    def cancel_order_list(self, params):
+        with self.lock:
+            self.match()
+            order_list = self.order_lists.get(int(params.get('orderListId', 0)))
+            if not order_list or order_list['listOrderStatus'] != 'EXECUTING':
+                return 400, {'code': -2011, 'msg': 'Unknown order list sent.'}
+            self.release(self.orders[order_list['orders'][0]])
+            self.finish_list(order_list['orderListId'], 'CANCELED')
+        return 200, self.format_order_list(order_list)
+
+    def get_order_list(self, params):
+        with self.lock:
+            self.match()
+            order_list = self.order_lists.get(int(params.get('orderListId', 0)))
+        if not order_list:
+            return 400, {'code': -2013, 'msg': 'Order list does not exist.'}
+        return 200, self.format_order_list(order_list)
+
+    def format_order_list(self, order_list):
+        formatted = dict(order_list)
+        formatted['orders'] = [{'symbol': order_list['symbol'], 'orderId': order_id}
+                               for order_id in order_list['orders']]
+        formatted['orderReports'] = [self.format_order(self.orders[order_id]) for order_id in order_list['orders']]
+        return formatted
+
+    def get_order(self, params):
+        with self.lock:
+            self.match()
+            order = self.orders.get(int(params.get('orderId', 0)))
+        if not order:
+            return 400, {'code': -2013, 'msg': 'Order does not exist.'}
+        return 200, self.format_order(order)
+
+    def cancel_order(self, params):
+        with self.lock:
+            self.match()
+            order = self.orders.get(int(params.get('orderId', 0)))
+            if not order or order['status'] != 'NEW':
+                return 400, {'code': -2011, 'msg': 'Unknown order sent.'}
+            self.release(order)
+            order['status'] = 'CANCELED'
+            if 'orderListId' in order:
+                self.finish_list(order['orderListId'], 'CANCELED')
+        return 200, self.format_order(order)
+
+    def format_order(self, order):
+        formatted = {name: value for name, value in order.items() if name != 'reserved'}
+        for name in ('origQty', 'executedQty', 'cummulativeQuoteQty', 'price', 'stopPrice'):
+            formatted[name] = '{:.8f}'.format(order[name])
+        return formatted
+
+    def handle(self, method, path, params):
+        if path in ('/api/v1/exchangeInfo', '/api/v3/exchangeInfo'):
+            return 200, self.exchange_info()
+        if path in ('/api/v1/klines', '/api/v3/klines'):
+            if params.get('symbol') not in self.symbols:
+                return 400, {'code': -1121, 'msg': 'Invalid symbol.'}
+            return 200, self.get_klines(params['symbol'], params.get('interval', '1m'),
+                                        int(params['startTime']) if 'startTime' in params else None,
+                                        int(params['endTime']) if 'endTime' in params else None,
+                                        int(params.get('limit', 500)))
+        if path == '/api/v3/ticker/price':
+            return 200, self.ticker_prices()
+        if path == '/api/v3/account':
+            with self.lock:
+                self.match()
+            return 200, self.account()
+        if path == '/api/v3/order':
+            if method == 'POST':
+                return self.place_order(params)
+            if method == 'DELETE':
+                return self.cancel_order(params)
+            return self.get_order(params)
+        if path == '/api/v3/order/oco' and method == 'POST':
+            return self.place_oco(params)
+        if path == '/api/v3/orderList':
+            if method == 'DELETE':
+                return self.cancel_order_list(params)
+            return self.get_order_list(params)
+        if path == '/api/v3/userDataStream':
+            if method == 'POST':
+                return 200, {'listenKey': 'simulator'}
+            return 200, {}
+        if path == '/api/v3/time':
+            return 200, {'serverTime': self.clock.now()}
+        return 404, {'code': -1, 'msg': 'Unsupported endpoint.'}
+
+
+class SimulatorHandler(BaseHTTPRequestHandler):
+    exchange = None
+    latency = 0
+
+    def respond(self, method):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            params.update(parse_qsl(self.rfile.read(length).decode()))
+        if self.latency:
+            sleep(self.latency)
+
+        status, payload = self.exchange.handle(method, url.path, params)
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.respond('GET')
+
+    def do_POST(self):
+        self.respond('POST')
+
+    def do_PUT(self):
+        self.respond('PUT')
+
+    def do_DELETE(self):
+        self.respond('DELETE')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    exchange = None
+    push_interval = 1
+    connections = None
+    rbufsize = 0
+    websocket_guid = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+    def do_GET(self):
+        key = self.headers.get('Sec-WebSocket-Key')
+        if not key or self.headers.get('Upgrade', '').lower() != 'websocket':
+            self.send_error(400)
+            return
+        url = urlsplit(self.path)
+        if url.path == '/stream':
+            streams = [stream.split('@kline_') for stream in dict(parse_qsl(url.query)).get('streams', '').split('/')
+                       if '@kline_' in stream]
+        elif url.path.startswith('/ws/'):
+            streams = []
+        else:
+            self.send_error(404)
+            return
+
+        self.send_response(101)
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', base64.b64encode(
+            hashlib.sha1((key + self.websocket_guid).encode()).digest()).decode())
+        self.end_headers()
+        self.wfile.flush()
+
+        self.connections.add(self)
+        try:
+            while self.receive():
+                for symbol, interval in streams:
+                    event = self.exchange.kline_event(symbol.upper(), interval)
+                    if event:
+                        self.send_frame(1, json.dumps({'stream': '{}@kline_{}'.format(symbol, interval),
+                                                       'data': event}).encode())
+        except OSError:
+            pass
+        finally:
+            self.connections.discard(self)
+
+    def receive(self):
+        if not select.select([self.connection], [], [], self.push_interval)[0]:
+            return True
+        header = self.read_exactly(2)
+        opcode, length = header[0] & 0x0f, header[1] & 0x7f
+        if length == 126:
+            length = struct.unpack('!H', self.read_exactly(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self.read_exactly(8))[0]
+        mask = self.read_exactly(4) if header[1] & 0x80 else b'\0\0\0\0'
+        payload = bytes(byte ^ mask[index % 4] for index, byte in enumerate(self.read_exactly(length)))
+        if opcode == 8:
+            self.send_frame(8, payload[:2])
+            return False
+        if opcode == 9:
+            self.send_frame(10, payload)
+        return True
+
+    def read_exactly(self, length):
+        data = b''
+        while len(data) < length:
+            chunk = self.rfile.read(length - len(data))
+            if not chunk:
+                raise OSError('Connection closed')
+            data += chunk
+        return data
+
+    def send_frame(self, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+        self.wfile.write(header + payload)
+        self.wfile.flush()
+
+    def drop(self):
+        self.connection.shutdown(socket.SHUT_RDWR)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ExchangeAdapter(requests.adapters.BaseAdapter):
+
+    def __init__(self, exchange):
+        super(ExchangeAdapter, self).__init__()
+        self.exchange = exchange
+
+    def send(self, request, **kwargs):
+        url = urlsplit(request.url)
+        params = dict(parse_qsl(url.query))
+        if request.body:
+            params.update(parse_qsl(request.body if isinstance(request.body, str) else request.body.decode()))
+
+        status, payload = self.exchange.handle(request.method, url.path, params)
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(payload).encode()
+        response.headers['Content-Type'] = 'application/json'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+def serve(exchange, host='127.0.0.1', port=0, latency=0):
+    handler = type('Handler', (SimulatorHandler,), {'exchange': exchange, 'latency': latency})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def serve_streams(exchange, host='127.0.0.1', port=0, push_interval=1):
+    handler = type('Handler', (StreamHandler,), {'exchange': exchange, 'push_interval': push_interval,
+                                                 'connections': set()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def synthetic_klines(symbol_count, minutes, start_time, quote='ETH', volatility=0.004, pump_rate=0.0005, seed=None):
+    random = numpy.random.default_rng(seed)
+    klines_by_symbol = {}
+    for index in range(symbol_count):
+        returns = random.normal(0, volatility, minutes)
+        pumps = numpy.flatnonzero(random.random(minutes) < pump_rate)
+        for pump in pumps:
+            returns[pump:pump + 5] += random.uniform(0.015, 0.04)
+        close = random.uniform(0.0001, 0.1) * numpy.exp(numpy.cumsum(returns))
+        klines = numpy.empty(minutes, dtype=kline_store.kline_dtype)
+        klines['open_time'] = start_time + numpy.arange(minutes) * 60000
+        klines['close_time'] = klines['open_time'] + 59999
+        klines['open'] = numpy.concatenate(([close[0]], close[:-1]))
+        klines['close'] = close
+        spread = numpy.abs(random.normal(0, volatility / 2, minutes))
+        klines['high'] = numpy.maximum(klines['open'], close) * (1 + spread)
+        klines['low'] = numpy.minimum(klines['open'], close) * (1 - spread)
+        klines['volume'] = random.uniform(1, 1000, minutes)
+        klines_by_symbol['SIM{}{}'.format(index, quote)] = klines
+    return klines_by_symbol
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve recorded or synthetic klines as a local stand-in exchange.')
+    parser.add_argument('symbols', nargs='*', help='recorded symbols to replay from the kline store')
+    parser.add_argument('--root', default=kline_store.KlineStore.root)
+    parser.add_argument('--synthetic', type=int, default=0, help='number of synthetic symbols to generate')
+    parser.add_argument('--days', type=float, default=1, help='days of synthetic klines')
+    parser.add_argument('--pump-rate', type=float, default=0.0005, help='chance per minute of a synthetic pump')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--start', help='replay start date, defaults to the earliest kline')
+    parser.add_argument('--warmup', type=float, default=60, help='minutes of klines already closed at start')
+    parser.add_argument('--speed', type=float, default=1, help='replay clock speed-up factor')
+    parser.add_argument('--latency', type=float, default=0, help='seconds added to every response')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--run-bot', action='store_true', help='run the Binance bot against the simulator')
+    parser.add_argument('--market-type', choices=('BULL', 'BEAR'))
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--processes', type=int, default=1, help='shard the bot over this many processes')
+    parser.add_argument('--protective-orders', action='store_true', help='protect positions with OCO/stop orders')
+    parser.add_argument('--stream', action='store_true', help='serve kline WebSocket streams and let the bot use them')
+    args = parser.parse_args()
+
+    start_time = int(time() * 1000) // 60000 * 60000 - int(args.days * 86400000)
+    if args.start:
+        start_time = backtest.parse_date(args.start)
+    klines_by_symbol = {}
+    if args.symbols:
+        store = kline_store.KlineStore(None, None, args.root)
+        klines_by_symbol.update({symbol: store.load(symbol, '1m') for symbol in args.symbols})
+        if not args.start:
+            start_time = min(int(klines['open_time'][0]) for klines in klines_by_symbol.values() if len(klines))
+    if args.synthetic:
+        klines_by_symbol.update(synthetic_klines(args.synthetic, int(args.days * 1440), start_time,
+                                                 pump_rate=args.pump_rate, seed=args.seed))
+
+    exchange = SimulatedExchange(klines_by_symbol, ReplayClock(start_time + int(args.warmup * 60000), args.speed))
+    server = serve(exchange, args.host, args.port, args.latency)
+    base_url = 'http://{}:{}'.format(*server.server_address)
+    print('Simulated exchange with {} symbols listening on {}'.format(len(klines_by_symbol), base_url))
+    stream_url = None
+    if args.stream:
+        stream_server = serve_streams(exchange, args.host)
+        stream_url = 'ws://{}:{}'.format(*stream_server.server_address)
+        print('Serving kline streams on {}'.format(stream_url))
+
+    if args.run_bot:
+        import main as bot
+
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as config_file:
+            json.dump({'api_key': 'simulator', 'secret_key': 'simulator', 'base_url': base_url,
+                       'protective_orders': args.protective_orders, 'stream_url': stream_url}, config_file)
+        try:
+            if args.processes > 1:
+                import shard
+                shard.run(config_file.name, args.market_type, args.processes, args.workers, args.stream)
+            else:
+                bot.Binance(config_file.name, args.market_type, args.workers, args.stream).start()
+        finally:
+            os.remove(config_file.name)
+    else:
+        try:
+            while True:
+                sleep(60)
+        except KeyboardInterrupt:
+            server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,162 +1,218 @@
+import concurrent.futures
 import json
 from datetime import datetime
-from time import mktime, sleep
-from urllib.parse import urlencode
+from time import mktime
 
-import requests
+import numpy
 
+import client
+import indicators
+import kline_store
 import utils
 
 base_url = 'https://api.binance.com'
+fetch_workers = 8
+session = client.RateLimitedSession(pool_size=fetch_workers)
+store = None
+history_starting_timestamp = mktime(datetime.strptime(
+    '2017/01/01-00:00:00', "%Y/%m/%d-%H:%M:%S").timetuple()) * 1000
 
-statistics_list = []
+watermark_span = 500 * 86400000
 
+watermark_windows = {}
+daily_klines = {}
+
+
+def get_store():
+    global store
+    if store is None:
+        store = kline_store.KlineStore(session, base_url)
+    return store
+
+
+def fetch_symbol_klines(symbol, interval, start_time, daily):
+    if daily:
+        get_daily_klines(symbol)
+    return store.query(symbol, interval, start_time)
+
+
+def fetch_klines(symbols, interval, start_time, skipped=None, daily=False):
+    get_store()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=fetch_workers) as executor:
+        futures = {executor.submit(fetch_symbol_klines, symbol, interval, start_time, daily): symbol
+                   for symbol in symbols}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                yield futures[future], future.result()
+            except RuntimeError as e:
+                if skipped is None:
+                    raise
+                skipped[futures[future]] = str(e)
 
-def get_buy_watermark(symbol, buy_price, timestamp):
-    history_high = 0
-    history_low = 1000000000
-    kline_data = {'symbol': symbol, 'interval': '1d', 'limit': 500}
-    for kline in requests.get('{}/api/v1/klines?{}'.format(base_url, urlencode(kline_data))).json():
-        kline_timestamp = float(kline[0])
 
-        if kline_timestamp >= timestamp:
-            break
+def write_record(statistics_file, record):
+    statistics_file.write(json.dumps(record) + '\n')
+    statistics_file.flush()
 
-        price_close = float(kline[4])
 
-        if price_close >= history_high:
-            history_high = price_close
+def read_records(path):
+    with open(path) as statistics_file:
+        for line in statistics_file:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
 
-        if price_close <= history_low:
-            history_low = price_close
 
-    if history_high - history_low > 0:
+def get_daily_klines(symbol):
+    klines = daily_klines.get(symbol)
+    if klines is None:
+        klines = daily_klines[symbol] = get_store().query(symbol, '1d', int(history_starting_timestamp))
+    return klines
+
+
+def get_buy_watermark(symbol, buy_price, timestamp):
+    klines = get_daily_klines(symbol)
+    window, start, queried_at = watermark_windows.get(symbol, (None, 0, None))
+    if window is None or timestamp < queried_at:
+        window = indicators.RollingWindow(watermark_span)
+        start = numpy.searchsorted(klines['open_time'], timestamp - watermark_span)
+
+    end = max(numpy.searchsorted(klines['open_time'], timestamp), start)
+    for open_time, price_close in zip(klines['open_time'][start:end].tolist(), klines['close'][start:end].tolist()):
+        window.push(open_time, price_close, price_close)
+    window.evict(timestamp)
+    watermark_windows[symbol] = (window, end, timestamp)
+
+    history_high = window.high()
+    history_low = window.low()
+    if history_high is not None and history_high - history_low > 0:
         return (buy_price - history_low) / (history_high - history_low)
     return 1
 
 
 def analyze_bull(base_symbol):
-    symbols = [symbol['symbol'] for symbol in requests.get('{}/api/v3/ticker/price'.format(base_url)).json()
+    symbols = [symbol['symbol'] for symbol in session.get('{}/api/v3/ticker/price'.format(base_url)).json()
                if symbol['symbol'].endswith(base_symbol)]
-    for symbol in symbols:
-        highest_price = 0
-        starting_timestamp = 0
-        highest_price_timestamp = 0
-        buy_price = 0
-        possess = False
-        time_take = 0
-        cooldown_time = 0
-        profit = 0
-        starting_increase = 0
-        buy_watermark = 0
-        buy_date = None
-        base_time = '1h'
-        kline_starting_timestamp = mktime(datetime.strptime(
-            '2018/01/01-00:00:00', "%Y/%m/%d-%H:%M:%S").timetuple()) * 1000
-        kline_data = {'symbol': symbol, 'interval': base_time, 'limit': 500}
-        klines = requests.get('{}/api/v1/klines?{}'.format(base_url, urlencode(kline_data))).json()
-        klines.pop(0)
-        for kline in klines:
-            price_open = float(kline[1])
-            price_close = float(kline[4])
-            price_low = float(kline[3])
-            price_high = float(kline[2])
-            timestamp = float(kline[0])
-
-            if price_close >= highest_price:
-                highest_price = price_high
-                highest_price_timestamp = timestamp
-
-            if not possess and price_high / price_open - 1 > 0.09:
-                buy_price = price_open * 1.09
-                starting_timestamp = timestamp
-                buy_date = datetime.fromtimestamp(
-                    int(starting_timestamp / 1000)).strftime('%Y-%m-%d %H:%M:%S')
-                starting_increase = price_high / price_open - 1
-                cooldown_time = timestamp - highest_price_timestamp
-                highest_price = price_high
-                highest_price_timestamp = timestamp
-                buy_watermark = get_buy_watermark(symbol, buy_price, starting_timestamp)
-                possess = True
-        sleep(1)
-
-        if possess:
-            time_take = highest_price_timestamp - starting_timestamp
-            profit = highest_price / buy_price - 1
-
-        symbol_statistics_json = {'symbol': symbol, 'cooldown': cooldown_time/3600000,
-                                  'buy_price': buy_price, 'time_take': time_take/3600000,
-                                  'profit': profit, 'starting_increase': starting_increase,
-                                  'buy_watermark': buy_watermark,
-                                  'highest_price_since_buy': highest_price,
-                                  'buy_date': buy_date}
-
-        statistics_list.append(symbol_statistics_json)
-
-    with open('statistics-{}.log'.format(base_time), 'a+') as statistics_file:
-        json.dump(statistics_list, statistics_file, indent=4)
-        statistics_file.write('\n')
+    base_time = '1h'
+    kline_starting_timestamp = mktime(datetime.strptime(
+        '2018/01/01-00:00:00', "%Y/%m/%d-%H:%M:%S").timetuple()) * 1000
+    watermark_windows.clear()
+    skipped = {}
+    with open('statistics-{}.log'.format(base_time), 'a') as statistics_file:
+        for symbol, klines in fetch_klines(symbols, base_time, int(kline_starting_timestamp), skipped, daily=True):
+            write_record(statistics_file, analyze_bull_symbol(symbol, klines))
+    return skipped
+
+
+def analyze_bull_symbol(symbol, klines):
+    highest_price = 0
+    starting_timestamp = 0
+    highest_price_timestamp = 0
+    buy_price = 0
+    possess = False
+    time_take = 0
+    cooldown_time = 0
+    profit = 0
+    starting_increase = 0
+    buy_watermark = 0
+    buy_date = None
+    for kline in klines[1:]:
+        price_open = float(kline['open'])
+        price_close = float(kline['close'])
+        price_low = float(kline['low'])
+        price_high = float(kline['high'])
+        timestamp = float(kline['open_time'])
+
+        if price_close >= highest_price:
+            highest_price = price_high
+            highest_price_timestamp = timestamp
+
+        if not possess and price_high / price_open - 1 > 0.09:
+            buy_price = price_open * 1.09
+            starting_timestamp = timestamp
+            buy_date = datetime.fromtimestamp(
+                int(starting_timestamp / 1000)).strftime('%Y-%m-%d %H:%M:%S')
+            starting_increase = price_high / price_open - 1
+            cooldown_time = timestamp - highest_price_timestamp
+            highest_price = price_high
+            highest_price_timestamp = timestamp
+            buy_watermark = get_buy_watermark(symbol, buy_price, starting_timestamp)
+            possess = True
+
+    if possess:
+        time_take = highest_price_timestamp - starting_timestamp
+        profit = highest_price / buy_price - 1
+
+    return {'symbol': symbol, 'cooldown': cooldown_time/3600000,
+            'buy_price': buy_price, 'time_take': time_take/3600000,
+            'profit': profit, 'starting_increase': starting_increase,
+            'buy_watermark': buy_watermark,
+            'highest_price_since_buy': highest_price,
+            'buy_date': buy_date}
 
 
 def analyze_bear(base_symbol):
-    symbols = [symbol['symbol'] for symbol in requests.get('{}/api/v3/ticker/price'.format(base_url)).json()
+    symbols = [symbol['symbol'] for symbol in session.get('{}/api/v3/ticker/price'.format(base_url)).json()
                if symbol['symbol'].endswith(base_symbol)]
-    for symbol in symbols:
-        starting_timestamp = 0
-        buy_price = 0
-        possess = False
-        highest_profit = 0
-        lowest_profit = 100000
-        kline_starting_timestamp = mktime(datetime.strptime(
-            '2018/01/01-00:00:00', "%Y/%m/%d-%H:%M:%S").timetuple()) * 1000
-        kline_data = {'symbol': symbol, 'interval': '6h', 'limit': 500, 'startTime': int(kline_starting_timestamp)}
-        klines = requests.get('{}/api/v1/klines?{}'.format(base_url, urlencode(kline_data))).json()
-
-        for kline in klines:
-            price_open = float(kline[1])
-            price_low = float(kline[3])
-            timestamp = float(kline[0])
-
-            if possess and timestamp != starting_timestamp:
-                sell_price = price_open
-                profit = sell_price / buy_price - 1
-                if highest_profit < profit:
-                    highest_profit = profit
-                if lowest_profit > profit:
-                    lowest_profit = profit
-                possess = False
-
-            if not possess and price_open / price_low >= 1.2:
-                buy_price = price_open / 1.2
-                starting_timestamp = timestamp
-                possess = True
-
-        symbol_statistics_json = {'symbol': symbol,
-                                  'highest_profit': highest_profit,
-                                  'lowest_profit': lowest_profit}
-
-        statistics_list.append(symbol_statistics_json)
-
-    with open('statistics.log', 'a+') as statistics_file:
-        json.dump(statistics_list, statistics_file, indent=4)
-        statistics_file.write('\n')
-
-
-def max_profit():
-    with open('statistics.log', 'r') as statistics_file:
-        data = json.load(statistics_file)
-
-    profit_percent_low = None
-    profit_percent_high = 0.3
-
-    total = len(data)
-    if profit_percent_low:
-        below_low_total = len([d for d in data if d['profit'] < profit_percent_low])
-        in_low_high_total = len([d for d in data if profit_percent_low <= d['profit'] < profit_percent_high])
-    else:
-        below_low_total = len([d for d in data if d['profit'] < profit_percent_high])
-    above_high_total = len([d for d in data if d['profit'] >= profit_percent_high])
-
+    kline_starting_timestamp = mktime(datetime.strptime(
+        '2018/01/01-00:00:00', "%Y/%m/%d-%H:%M:%S").timetuple()) * 1000
+    skipped = {}
+    with open('statistics.log', 'a') as statistics_file:
+        for symbol, klines in fetch_klines(symbols, '6h', int(kline_starting_timestamp), skipped):
+            write_record(statistics_file, analyze_bear_symbol(symbol, klines))
+    return skipped
+
+
+def analyze_bear_symbol(symbol, klines):
+    starting_timestamp = 0
+    buy_price = 0
+    possess = False
+    highest_profit = 0
+    lowest_profit = 100000
+
+    for kline in klines:
+        price_open = float(kline['open'])
+        price_low = float(kline['low'])
+        timestamp = float(kline['open_time'])
+
+        if possess and timestamp != starting_timestamp:
+            sell_price = price_open
+            profit = sell_price / buy_price - 1
+            if highest_profit < profit:
+                highest_profit = profit
+            if lowest_profit > profit:
+                lowest_profit = profit
+            possess = False
+
+        if not possess and price_open / price_low >= 1.2:
+            buy_price = price_open / 1.2
+            starting_timestamp = timestamp
+            possess = True
+
+    return {'symbol': symbol,
+            'highest_profit': highest_profit,
+            'lowest_profit': lowest_profit}
+
+
+def max_profit(path='statistics-1h.log', profit_percent_low=None, profit_percent_high=0.3):
+    total = 0
+    below_low_total = 0
+    in_low_high_total = 0
+    above_high_total = 0
+    for record in read_records(path):
+        total += 1
+        if record['profit'] >= profit_percent_high:
+            above_high_total += 1
+        elif profit_percent_low and record['profit'] >= profit_percent_low:
+            in_low_high_total += 1
+        else:
+            below_low_total += 1
+
+    if not total:
+        return 0
     if profit_percent_low:
         gain_low = in_low_high_total / total * profit_percent_low * 0.5 - (total - in_low_high_total) / total * 0.5 * 0.1
     else:
@@ -168,12 +224,13 @@ def max_profit():
 
 
 def get_trading_pairs_rule():
-    exchange_info = requests.get('{}/api/v1/exchangeInfo'.format(base_url)).json()['symbols']
+    exchange_info = session.get('{}/api/v1/exchangeInfo'.format(base_url)).json()['symbols']
     pass
 
 
-get_trading_pairs_rule()
-# analyze_bear('USDT')
-analyze_bull('ETH')
-profit = max_profit()
-pass
+if __name__ == '__main__':
+    get_trading_pairs_rule()
+    # analyze_bear('USDT')
+    for skipped_symbol, error in sorted(analyze_bull('ETH').items()):
+        print('Skipped {}: {}'.format(skipped_symbol, error))
+    profit = max_profit()
@@ -0,0 +1,240 @@
+import json
+import threading
+from time import sleep
+from urllib.parse import urlencode
+
+import websocket
+
+
+class KlineStream(object):
+    stream_url = 'wss://stream.binance.com:9443'
+    streams_per_connection = 200
+    reconnect_delay = 1
+    max_reconnect_delay = 60
+    ping_interval = 60
+    backfill_limit = 1000
+
+    def __init__(self, session, base_url, symbols, interval, stream_url=None, log=None):
+        self.session = session
+        self.base_url = base_url
+        self.interval = interval
+        if stream_url:
+            self.stream_url = stream_url
+        self.log = log or (lambda symbol, msg: None)
+        self.symbols = list(symbols)
+        self.klines = {}
+        self.listeners = []
+        self.connections = []
+        self.connection_by_symbol = {}
+        self.running = False
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.running = True
+        for index in range(0, len(self.symbols), self.streams_per_connection):
+            connection = StreamConnection(self, self.symbols[index:index + self.streams_per_connection])
+            for symbol in connection.symbols:
+                self.connection_by_symbol[symbol] = connection
+            self.connections.append(connection)
+            connection.start()
+        self.log('Stream', 'Subscribed {} kline streams over {} connections'.format(len(self.symbols),
+                                                                                 len(self.connections)))
+
+    def stop(self):
+        self.running = False
+        for connection in self.connections:
+            connection.close()
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def get(self, symbol):
+        connection = self.connection_by_symbol.get(symbol)
+        if not connection or not connection.connected:
+            return None
+        return self.klines.get(symbol)
+
+    def update(self, symbol, kline, closed):
+        with self.lock:
+            current = self.klines.get(symbol)
+            if current and int(current[0]) > int(kline[0]):
+                return
+            self.klines[symbol] = kline
+        for listener in self.listeners:
+            listener(symbol, kline, closed)
+
+    def on_message(self, message):
+        payload = json.loads(message)
+        data = payload.get('data', payload)
+        if data.get('e') != 'kline':
+            return
+        k = data['k']
+        kline = [k['t'], k['o'], k['h'], k['l'], k['c'], k['v'], k['T'],
+                 k.get('q'), k.get('n'), k.get('V'), k.get('Q'), k.get('B')]
+        self.update(data['s'], kline, k.get('x', False))
+
+    def backfill(self, symbols):
+        for symbol in symbols:
+            if not self.running:
+                return
+            kline_data = {'symbol': symbol, 'interval': self.interval}
+            current = self.klines.get(symbol)
+            if current:
+                kline_data['startTime'] = int(current[0])
+                kline_data['limit'] = self.backfill_limit
+            else:
+                kline_data['limit'] = 1
+            kline_response = self.session.get('{}/api/v1/klines?{}'.format(self.base_url, urlencode(kline_data)))
+
+            if kline_response.status_code != 200:
+                self.log('ERROR', 'Failed to backfill {} kline. status code: {}'.format(
+                    symbol, kline_response.status_code))
+                continue
+
+            klines = kline_response.json()
+            for index, kline in enumerate(klines):
+                self.update(symbol, kline, index < len(klines) - 1)
+
+
+class StreamConnection(object):
+
+    def __init__(self, stream, symbols):
+        self.stream = stream
+        self.symbols = symbols
+        self.connected = False
+        self.ws = None
+        self.generation = 0
+        self.open_generation = None
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def url(self):
+        return '{}/stream?streams={}'.format(self.stream.stream_url, '/'.join(
+            '{}@kline_{}'.format(symbol.lower(), self.stream.interval) for symbol in self.symbols))
+
+    def start(self):
+        self.thread.start()
+
+    def close(self):
+        with self.lock:
+            self.open_generation = None
+            self.connected = False
+        if self.ws:
+            self.ws.close()
+
+    def run(self):
+        delay = self.stream.reconnect_delay
+        while self.stream.running:
+            with self.lock:
+                self.generation += 1
+                generation = self.generation
+            self.ws = websocket.WebSocketApp(self.url(),
+                                             on_open=lambda ws, generation=generation: self.on_open(generation),
+                                             on_message=lambda ws, message: self.stream.on_message(message),
+                                             on_error=lambda ws, error: self.stream.log(
+                                                 'ERROR', 'Kline stream error: {}'.format(error)))
+            self.ws.run_forever(ping_interval=self.stream.ping_interval)
+            with self.lock:
+                opened = self.open_generation == generation
+                self.open_generation = None
+                self.connected = False
+
+            if not self.stream.running:
+                break
+            if opened:
+                delay = self.stream.reconnect_delay
+            self.stream.log('Stream', 'Kline stream disconnected, reconnecting in {}s'.format(delay))
+            sleep(delay)
+            delay = min(delay * 2, self.stream.max_reconnect_delay)
+
+    def on_open(self, generation):
+        with self.lock:
+            self.open_generation = generation
+        threading.Thread(target=self.backfill, args=(generation,), daemon=True).start()
+
+    def backfill(self, generation):
+        self.stream.backfill(self.symbols)
+        with self.lock:
+            if self.open_generation == generation:
+                self.connected = True
+
+
+class UserDataStream(object):
+    stream_url = 'wss://stream.binance.com:9443'
+    keepalive_interval = 1800
+    reconnect_delay = 1
+    max_reconnect_delay = 60
+    ping_interval = 60
+
+    def __init__(self, session, base_url, stream_url=None, log=None):
+        self.session = session
+        self.base_url = base_url
+        if stream_url:
+            self.stream_url = stream_url
+        self.log = log or (lambda symbol, msg: None)
+        self.listeners = []
+        self.connect_listeners = []
+        self.listen_key = None
+        self.running = False
+        self.ws = None
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def add_connect_listener(self, listener):
+        self.connect_listeners.append(listener)
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self.run, daemon=True).start()
+        threading.Thread(target=self.keepalive, daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        if self.ws:
+            self.ws.close()
+
+    def create_listen_key(self):
+        response = self.session.post('{}/api/v3/userDataStream'.format(self.base_url))
+        if response.status_code != 200:
+            self.log('ERROR', 'Failed to create listen key. status code: {}'.format(response.status_code))
+            return None
+        return response.json()['listenKey']
+
+    def keepalive(self):
+        while self.running:
+            sleep(self.keepalive_interval)
+            if not self.listen_key:
+                continue
+            response = self.session.put('{}/api/v3/userDataStream?{}'.format(
+                self.base_url, urlencode({'listenKey': self.listen_key})))
+            if response.status_code != 200:
+                self.log('ERROR', 'Failed to keep listen key alive. status code: {}'.format(response.status_code))
+
+    def on_open(self):
+        for listener in self.connect_listeners:
+            listener()
+
+    def on_message(self, message):
+        event = json.loads(message)
+        for listener in self.listeners:
+            listener(event)
+
+    def run(self):
+        delay = self.reconnect_delay
+        while self.running:
+            self.listen_key = self.create_listen_key()
+            if self.listen_key:
+                self.ws = websocket.WebSocketApp('{}/ws/{}'.format(self.stream_url, self.listen_key),
+                                                 on_open=lambda ws: self.on_open(),
+                                                 on_message=lambda ws, message: self.on_message(message),
+                                                 on_error=lambda ws, error: self.log(
+                                                     'ERROR', 'User data stream error: {}'.format(error)))
+                self.ws.run_forever(ping_interval=self.ping_interval)
+                delay = self.reconnect_delay
+
+            if not self.running:
+                break
+            self.log('Stream', 'User data stream disconnected, reconnecting in {}s'.format(delay))
+            sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
@@ -0,0 +1,113 @@
+import argparse
+import concurrent.futures
+import csv
+import itertools
+import os
+
+import numpy
+
+import backtest
+
+swept_parameters = ('trigger_percent', 'stop_loss_percent', 'already_increased_percent',
+                    'take_profit_low_percent', 'fluctuation_restrict', 'kline_interval')
+summary_fields = ('trades', 'win_rate', 'total_profit', 'average_profit', 'max_drawdown', 'best', 'worst')
+
+worker_klines = {}
+
+
+def parse_range(value):
+    if ':' in value:
+        start, stop, step = (float(part) for part in value.split(':'))
+        return [round(float(number), 10) for number in numpy.arange(start, stop + step / 2, step)]
+    values = []
+    for part in value.split(','):
+        if part.lower() == 'none':
+            values.append(None)
+            continue
+        try:
+            values.append(float(part))
+        except ValueError:
+            values.append(part)
+    return values
+
+
+def build_grid(ranges):
+    names = [name for name in swept_parameters if name in ranges]
+    return [dict(zip(names, values)) for values in itertools.product(*(ranges[name] for name in names))]
+
+
+def init_worker(root, symbols, tick_interval, start_time, end_time):
+    import kline_store
+
+    store = kline_store.KlineStore(None, None, root)
+    worker_klines.update(backtest.load_klines(store, symbols, tick_interval, start_time, end_time, refresh=False))
+
+
+def evaluate(params, market_type):
+    trades = backtest.run(worker_klines, backtest.Strategy(market_type=market_type, **params))
+    return params, backtest.summarize(trades)
+
+
+def sweep(ranges, root, symbols, tick_interval, start_time, end_time=None, market_type='BULL', processes=None):
+    grid = build_grid(ranges)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes, initializer=init_worker,
+                                                initargs=(root, symbols, tick_interval, start_time,
+                                                          end_time)) as executor:
+        results = list(executor.map(evaluate, grid, itertools.repeat(market_type),
+                                    chunksize=max(len(grid) // ((processes or os.cpu_count()) * 4), 1)))
+    return sorted(results, key=lambda result: result[1]['total_profit'], reverse=True)
+
+
+def write_results(results, path):
+    names = [name for name in swept_parameters if results and name in results[0][0]]
+    with open(path, 'w', newline='') as results_file:
+        writer = csv.writer(results_file)
+        writer.writerow(['rank'] + names + list(summary_fields))
+        for rank, (params, summary) in enumerate(results, 1):
+            writer.writerow([rank] + [params[name] for name in names] + [summary[field] for field in summary_fields])
+
+
+def main():
+    import client
+    import kline_store
+
+    parser = argparse.ArgumentParser(description='Sweep strategy parameters over stored klines in parallel.')
+    parser.add_argument('symbols', nargs='*', help='symbols to sweep over, defaults to every pair of --base')
+    parser.add_argument('--base', default='ETH')
+    parser.add_argument('--market-type', default='BULL', choices=('BULL', 'BEAR'))
+    parser.add_argument('--tick-interval', default='1m')
+    parser.add_argument('--start', default='2018-01-01')
+    parser.add_argument('--end')
+    parser.add_argument('--root', default=kline_store.KlineStore.root)
+    parser.add_argument('--offline', action='store_true', help='only use klines already in the store')
+    parser.add_argument('--processes', type=int)
+    parser.add_argument('--output', default='sweep-results.csv')
+    parser.add_argument('--top', type=int, default=20)
+    for name in swept_parameters:
+        parser.add_argument('--{}'.format(name.replace('_', '-')), type=parse_range,
+                            help='start:stop:step or comma separated values')
+    args = parser.parse_args()
+
+    ranges = {name: getattr(args, name) for name in swept_parameters if getattr(args, name)}
+    start_time = backtest.parse_date(args.start)
+    end_time = backtest.parse_date(args.end) if args.end else None
+
+    base_url = 'https://api.binance.com'
+    session = client.RateLimitedSession()
+    store = kline_store.KlineStore(session, base_url, args.root)
+    symbols = args.symbols or [ticker['symbol'] for ticker in session.get(
+        '{}/api/v3/ticker/price'.format(base_url)).json() if ticker['symbol'].endswith(args.base)]
+    if not args.offline:
+        for symbol in symbols:
+            store.update(symbol, args.tick_interval, start_time, end_time)
+
+    results = sweep(ranges, args.root, symbols, args.tick_interval, start_time, end_time, args.market_type,
+                    args.processes)
+    write_results(results, args.output)
+
+    for rank, (params, summary) in enumerate(results[:args.top], 1):
+        print('{}. {} -> {}'.format(rank, params, summary))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,14 +1,16 @@
-from math import floor
+interval_milliseconds = {'m': 60000, 'h': 3600000, 'd': 86400000, 'w': 604800000}
 
 
-def order_precheck(symbol, quantity):
-    min_qty = float(symbol['filters'][1]['minQty'])
-    max_qty = float(symbol['filters'][1]['maxQty'])
-    qty_step = float(symbol['filters'][1]['stepSize'])
+def interval_to_milliseconds(interval):
+    return int(interval[:-1]) * interval_milliseconds[interval[-1]]
 
-    if min_qty <= quantity <= max_qty:
-        return floor(quantity / qty_step) * qty_step
-    return False
+
+def order_precheck(symbol, quantity, registry=None):
+    if registry is not None:
+        symbol = registry.rules(symbol)
+        if not symbol:
+            return False
+    return symbol.quantity(quantity)
 
 
 def handle_order_data(order_info):
@@ -16,18 +18,25 @@ def handle_order_data(order_info):
     total_quantity = 0
     total_commission = 0
     for fill in order_info['fills']:
-        total_price += float(fill['price']) * float(fill['qty'])
-        total_quantity += float(fill['qty'])
+        quantity = float(fill['qty'])
+        total_price += float(fill['price']) * quantity
+        total_quantity += quantity
         total_commission += float(fill['commission'])
 
     return total_price / total_quantity, total_commission
 
 
+def commission_in(order_info, asset):
+    return sum(float(fill['commission']) for fill in order_info['fills'] if fill['commissionAsset'] == asset)
+
+
 def qualify(klines, threshold_percent):
     lowest_price = 1000000000
     highest_price = 0
     for kline in klines:
-        price_low = float(kline[4]) if float(kline[4]) < float(kline[1]) else float(kline[1])
+        price_open = float(kline[1])
+        price_close = float(kline[4])
+        price_low = price_close if price_close < price_open else price_open
         price_high = float(kline[2])
         if price_low < lowest_price:
             lowest_price = price_low